@@ -2,6 +2,7 @@
 '''Four-in-a-Row, by AL swiegart al@inventwithpython.com
 A tile-dropping game to get four-in-a-row, similar to Connect Four.'''
 
+import functools
 import sys
 
 # Constants used for displaying the board:
@@ -9,23 +10,123 @@ EMPTY_SPACE = "." # a period is easier to count than a space.
 PLAYER_X = "X"
 PLAYER_O = "O"
 
-# Note: Update BOARD_TEMPLATE & COLUMN_LABELS if BOARD_WIDTH is changed.
-BOARD_WIDTH = 7
-BOARD_HEIGHT = 6
-COLUMN_LABELS = ("1", "2", "3", "4", "5", "6", "7")
-assert len(COLUMN_LABELS) == BOARD_WIDTH
-
-# The template string for displaying the board:
-BOARD_TEMPLATE = """
- 1234567
-+-------+
-|{}{}{}{}{}{}{}|
-|{}{}{}{}{}{}{}|
-|{}{}{}{}{}{}{}|
-|{}{}{}{}{}{}{}|
-|{}{}{}{}{}{}{}|
-|{}{}{}{}{}{}{}|
-+-------+"""
+# The four directions a line can go through a space, as (column, row)
+# steps: across, down, and the two diagonals. Each line also extends in
+# the opposite direction.
+LINE_DIRECTIONS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+# How many board configurations getBoardConfig() keeps. Each one holds
+# every line on its board, so don't keep them all.
+CONFIG_CACHE_SIZE = 64
+
+class BoardConfig:
+    """The size of a board and the number of tiles in a row that wins,
+    along with everything that can be worked out from them ahead of time:
+    the column labels, the template string for displaying the board, and
+    every line of spaces that a player can win with.
+
+    Spaces can also be numbered 0 to width * height - 1, left to right and
+    top to bottom (the same order as the template), which is how flat board
+    layouts like fourinarowflatboard.FlatBoard store them. lineIndexes has
+    every line as a tuple of these space indexes, and spaceLines[index]
+    has the numbers (positions in lines and lineIndexes) of every line
+    that goes through a space.
+
+    Don't create BoardConfig objects directly; call getBoardConfig(),
+    which keeps the recently used configurations instead of making them
+    again. Configurations of the same size are equal."""
+
+    def __init__(self, width, height, connect):
+        if width < 1 or height < 1:
+            raise ValueError(f"a board can't be {width}x{height}")
+        if connect < 2:
+            raise ValueError(f"connect must be at least 2, not {connect}")
+        if connect > max(width, height):
+            raise ValueError(f"can't get {connect} in a row on a {width}x{height} board")
+        self.width = width
+        self.height = height
+        self.connect = connect
+        self.columnLabels = tuple(str(columnIndex + 1) for columnIndex in range(width))
+        self.template = self._makeTemplate()
+        self.lines = self._makeLines()
+        self.lineIndexes = tuple(tuple(self.spaceIndex(space) for space in line) for line in self.lines)
+        spaceLines = [[] for i in range(width * height)]
+        for lineNumber, line in enumerate(self.lineIndexes):
+            for index in line:
+                spaceLines[index].append(lineNumber)
+        self.spaceLines = tuple(tuple(lineNumbers) for lineNumbers in spaceLines)
+
+    def spaceIndex(self, space):
+        """Returns the index of a (columnIndex, rowIndex) space in a flat board."""
+        columnIndex, rowIndex = space
+        return rowIndex * self.width + columnIndex
+
+    def _makeTemplate(self):
+        """Returns the template string for displaying the board, with a {}
+        for each space, left to right and top to bottom."""
+        if self.width < 10:
+            labels = " " + "".join(self.columnLabels)
+        else: # Put the tens digits of the column labels on a line of their own.
+            tens = "".join(label[-2] if len(label) > 1 else " " for label in self.columnLabels)
+            labels = " " + tens + "\n " + "".join(label[-1] for label in self.columnLabels)
+        border = "+" + "-" * self.width + "+"
+        rows = ["|" + "{}" * self.width + "|"] * self.height
+        return "\n".join(["", labels, border] + rows + [border])
+
+    def _makeLines(self):
+        """Returns a tuple of every line of 'connect' spaces on the board
+        (horizontal, vertical, and both diagonals), each a tuple of
+        (columnIndex, rowIndex) spaces."""
+        lines = []
+        for columnStep, rowStep in LINE_DIRECTIONS:
+            for columnIndex in range(self.width):
+                for rowIndex in range(self.height):
+                    lastColumn = columnIndex + columnStep * (self.connect - 1)
+                    lastRow = rowIndex + rowStep * (self.connect - 1)
+                    if 0 <= lastColumn < self.width and 0 <= lastRow < self.height:
+                        lines.append(tuple((columnIndex + columnStep * i, rowIndex + rowStep * i)
+                                           for i in range(self.connect)))
+        return tuple(lines)
+
+    def __repr__(self):
+        return f"getBoardConfig({self.width}, {self.height}, {self.connect})"
+
+    def __eq__(self, other):
+        if not isinstance(other, BoardConfig):
+            return NotImplemented
+        return (self.width, self.height, self.connect) == (other.width, other.height, other.connect)
+
+    def __hash__(self):
+        return hash((self.width, self.height, self.connect))
+
+    def __reduce__(self): # Unpickle through getBoardConfig(), so it isn't made twice.
+        return (getBoardConfig, (self.width, self.height, self.connect))
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def getBoardConfig(width=7, height=6, connect=4):
+    """Returns the BoardConfig for a board size and winning run length,
+    making it the first time it is asked for."""
+    return BoardConfig(width, height, connect)
+
+# The standard 7 x 6 board, where four in a row wins. Pass a different
+# BoardConfig to getNewBoard() for other sizes.
+DEFAULT_CONFIG = getBoardConfig(7, 6, 4)
+BOARD_WIDTH = DEFAULT_CONFIG.width
+BOARD_HEIGHT = DEFAULT_CONFIG.height
+COLUMN_LABELS = DEFAULT_CONFIG.columnLabels # ("1", "2", "3", "4", "5", "6", "7")
+
+# The template string for displaying the board, which looks like this:
+#  1234567
+# +-------+
+# |{}{}{}{}{}{}{}|
+#   ...six rows in all...
+# +-------+
+BOARD_TEMPLATE = DEFAULT_CONFIG.template
+
+def getBoardConfigOf(board):
+    """Returns the BoardConfig of a board. Plain dictionaries are assumed
+    to be standard boards."""
+    return getattr(board, "config", DEFAULT_CONFIG)
 
 def main():
     """Runs a single game of Four-in-a-Row."""
@@ -37,6 +138,24 @@ def main():
         """
         )
 
+    # Ask whether to play against the computer, and how long it can think:
+    computerPlayer = None
+    while True:
+        print("Enter the computer's seconds per move to play against it (e.g. 2),")
+        print("or press Enter for a two-player game:")
+        response = input("> ").strip()
+        if response == "":
+            break
+        try:
+            timeLimit = float(response)
+        except ValueError:
+            continue # Ask again.
+        if timeLimit > 0:
+            import fourinarowai, fourinarowbook # Imported here, since they import this module.
+            book = fourinarowbook.OpeningBook(fourinarowbook.DEFAULT_BOOK_PATH)
+            computerPlayer = fourinarowai.AIPlayer(timeLimit, book=book, solveEmpties=fourinarowbook.SOLVE_EMPTIES)
+            break
+
     # Set up a new game:
     gameBoard = getNewBoard()
     playerTurn = PLAYER_X
@@ -44,13 +163,28 @@ def main():
     while True: # Run a player's turn.
         # Display the board and get player's move:
         displayBoard(gameBoard)
-        playerMove = getPlayerMove(playerTurn, gameBoard) # playerMove is the tuple of the
-        # position on the board that the tiled was placed into.
+        if computerPlayer is not None and playerTurn == PLAYER_O: # The computer plays O.
+            playerMove = getDropSpace(gameBoard, computerPlayer.chooseMove(playerTurn, gameBoard))
+            print(f"The computer drops an O into column {COLUMN_LABELS[playerMove[0]]}.")
+            if computerPlayer.source == "book":
+                print("(from the opening book)")
+            elif computerPlayer.source == "solver":
+                print(f"(solved to the end of the game, {computerPlayer.nodesPerSecond:,.0f} nodes/sec)")
+            else:
+                print(f"(searched {computerPlayer.depth} moves ahead, {computerPlayer.nodesPerSecond:,.0f} nodes/sec, "
+                      f"transposition table hit rate {computerPlayer.table.hitRate:.0%})")
+        else:
+            playerMove = getPlayerMove(playerTurn, gameBoard) # playerMove is the tuple of the
+            # position on the board that the tiled was placed into.
         gameBoard[playerMove] = playerTurn # assign an 'X' or 'O' to the tuple on the board
         # that was selected in getPlayeMove()
 
-        # Check for a win or a tie:
-        if isWinner(playerTurn, gameBoard):
+        # Check for a win or a tie. Only lines through the tile that was
+        # just dropped can have changed, so only check those:
+        hasWon = isWinningMove(playerTurn, gameBoard, playerMove)
+        if computerPlayer is not None and (hasWon or isFull(gameBoard)):
+            computerPlayer.book.save() # Keep the positions the computer solved this game.
+        if hasWon:
             displayBoard(gameBoard) # Display the board one last time.
             print("Player {} has won!".format(playerTurn))
             sys.exit()
@@ -65,15 +199,73 @@ def main():
         elif playerTurn == PLAYER_O:
             playerTurn = PLAYER_X
 
-def getNewBoard():
+class FourInARowBoard(dict):
+    """A dictionary board that also keeps count of its empty spaces, so
+    isFull() doesn't have to look at every space, and knows its
+    BoardConfig."""
+
+    def __init__(self, spaces=(), config=DEFAULT_CONFIG):
+        super().__init__(spaces)
+        self.config = config
+        self.emptyCount = list(self.values()).count(EMPTY_SPACE)
+
+    def __setitem__(self, space, tile):
+        # Only count the change between empty and not empty:
+        wasEmpty = space in self and self[space] == EMPTY_SPACE
+        super().__setitem__(space, tile)
+        self.emptyCount += (tile == EMPTY_SPACE) - wasEmpty
+
+    # Every other dict method that changes the board has to keep the count too:
+    def __delitem__(self, space):
+        wasEmpty = self[space] == EMPTY_SPACE
+        super().__delitem__(space)
+        self.emptyCount -= wasEmpty
+
+    def pop(self, space, *default):
+        if space not in self:
+            return super().pop(space, *default)
+        tile = super().pop(space)
+        self.emptyCount -= tile == EMPTY_SPACE
+        return tile
+
+    def popitem(self):
+        space, tile = super().popitem()
+        self.emptyCount -= tile == EMPTY_SPACE
+        return space, tile
+
+    def setdefault(self, space, tile=None):
+        if space not in self:
+            self[space] = tile
+        return self[space]
+
+    def update(self, *args, **kwargs):
+        for space, tile in dict(*args, **kwargs).items():
+            self[space] = tile
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        super().clear()
+        self.emptyCount = 0
+
+    def copy(self):
+        return FourInARowBoard(self, self.config)
+
+    def __reduce__(self): # Makes copy.copy() and pickle recount the empty spaces.
+        return (FourInARowBoard, (dict(self), self.config))
+
+def getNewBoard(config=DEFAULT_CONFIG):
     """Returns a dictionary that represents a Four-in-a-Row board.
 
     The keys are (columnIndex, rowIndex) tuples of two integers, and the
-    values are one of the "X", "O" or "." (empty space) strings."""
+    values are one of the "X", "O" or "." (empty space) strings. The board
+    is the size given by config, a BoardConfig from getBoardConfig()."""
 
-    board = {}
-    for rowIndex in range(BOARD_HEIGHT):
-        for columnIndex in range(BOARD_WIDTH):
+    board = FourInARowBoard(config=config)
+    for rowIndex in range(config.height):
+        for columnIndex in range(config.width):
             board[(columnIndex,rowIndex)] = EMPTY_SPACE
             ''' Square brackets are used in dictionaries for referencing keys and
             in this case the key is a tuple '''
@@ -85,15 +277,16 @@ def displayBoard(board):
     # Prepare a list to pass to the format() string method for the board
     # template.  The list holds all the board's tiles (and empty
     # spaces) going left to right, top to bottom:
+    config = getBoardConfigOf(board)
     tileChars = []
-    for rowIndex in range(BOARD_HEIGHT):
-        for columnIndex in range(BOARD_WIDTH):
+    for rowIndex in range(config.height):
+        for columnIndex in range(config.width):
             tileChars.append(board[(columnIndex,rowIndex)])
             ''' You use square brackets to reference keys in a dictionary,
             and in this case the key is a 2 integer tuple, thus the format
             dictionary_name[(tuple)] '''
     # Display the board:
-    print(BOARD_TEMPLATE.format(*tileChars))
+    print(config.template.format(*tileChars))
     ''' the string.format() method works by putting in one or more replacement fields into
     placeholders which are defined by a pair of curly braces {}. So, in this
     case we are replacing the curly braces in BOARD_TEMPLATE with the values in the list
@@ -102,16 +295,17 @@ def displayBoard(board):
 def getPlayerMove(playerTile, board):
     '''Let a player select a coluumn on the board to drop a tile into.
         Returns a tuple of the (column, row) that the tile falls into.'''
+    config = getBoardConfigOf(board)
     while True: # Keep asking player until the they enter a valid move.
-        print(f"Player {playerTile}, enter 1 to {BOARD_WIDTH} or QUIT:")
+        print(f"Player {playerTile}, enter 1 to {config.width} or QUIT:")
         response = input("> ").upper().strip()
 
         if response == "QUIT":
             print("Thanks for playing!")
             sys.exit()
 
-        if response not in COLUMN_LABELS:
-            print(f"Enter a number from 1 to {BOARD_WIDTH}.")
+        if response not in config.columnLabels:
+            print(f"Enter a number from 1 to {config.width}.")
             continue # Ask player again for their move.
 
         columnIndex = int(response) - 1 # -1 for 0-based column indexes
@@ -121,17 +315,29 @@ def getPlayerMove(playerTile, board):
             print("That column is full, select another one.")
             continue # Ask player again for their move.
 
-        # Starting from the bottom, find the first empty space.
-        for rowIndex in range(BOARD_HEIGHT - 1, 1, -1): # start, stop, step or 5,1,-2
-            # remember, arrays start counting at 0 thus, BOARD_HEIGHT -1
-            if board[(columnIndex, rowIndex)] == EMPTY_SPACE:
-                return(columnIndex, rowIndex)
+        return getDropSpace(board, columnIndex)
+
+def getDropSpace(board, columnIndex):
+    '''Returns the (column, row) that a tile dropped into columnIndex
+        falls into, or None if the column is full.'''
+    # Starting from the bottom, find the first empty space.
+    for rowIndex in range(getBoardConfigOf(board).height - 1, -1, -1): # start, stop, step or 5,0,-1
+        # remember, arrays start counting at 0 thus, height - 1
+        if board[(columnIndex, rowIndex)] == EMPTY_SPACE:
+            return (columnIndex, rowIndex)
+    return None
 
 def isFull(board):
     '''Returns True if the 'board' has no empty spaces, otherwise
         returns False.'''
-    for rowIndex in range(BOARD_HEIGHT):
-        for columnIndex in range(BOARD_WIDTH):
+    emptyCount = getattr(board, 'emptyCount', None)
+    if emptyCount is not None:
+        return emptyCount == 0 # The board keeps count, see FourInARowBoard.
+
+    # Otherwise, look at every space:
+    config = getBoardConfigOf(board)
+    for rowIndex in range(config.height):
+        for columnIndex in range(config.width):
             if board[(columnIndex, rowIndex)] == EMPTY_SPACE:
                 return False # Found an empty space, so return False.
     return True # All spaces are full.
@@ -139,49 +345,38 @@ def isFull(board):
 def isWinner(playerTile, board):
     '''Returns True if 'playerTile' has four tiles in a row on 'board'.
     otherwise returns False.'''
-    # Go through the entire board, checking for four-in-a-row:
-
-    # check for horizontal four-in-a-row
-    for columnIndex in range(BOARD_WIDTH - 3): # because you need to spot 4 in a row
-        # and you need to check across four columns (+1, +2, +3), so iterate from 1 to 3
-        for rowIndex in range(BOARD_HEIGHT):
-            # Check for four-in-a-row going across to the right:
-            tile1 = board[(columnIndex, rowIndex)]
-            tile2 = board[(columnIndex + 1, rowIndex)]
-            tile3 = board[(columnIndex + 2, rowIndex)]
-            tile4 = board[(columnIndex + 3, rowIndex)]
-            if tile1 == tile2 == tile3 == tile4 == playerTile:
-                return True
-
-    # check for vertical four-in-a-row
-    for columnIndex in range(BOARD_WIDTH):
-        for rowIndex in range(BOARD_HEIGHT - 3):
-            # Check for four-in-a-row going down:
-            tile1 = board[(columnIndex, rowIndex)]
-            tile2 = board[(columnIndex, rowIndex + 1)]
-            tile3 = board[(columnIndex, rowIndex + 2)]
-            tile4 = board[(columnIndex, rowIndex + 3)]
-            if tile1 == tile2 == tile3 == tile4 == playerTile:
-                return True
-
-    # check for diagonal four-in-a-row
-    for columnIndex in range(BOARD_WIDTH - 3):
-        for rowIndex in range(BOARD_HEIGHT - 3):
-            # Check for four-in-a-row going right-down diagonal:
-            tile1 = board[(columnIndex, rowIndex)]
-            tile2 = board[(columnIndex + 1, rowIndex + 1)]
-            tile3 = board[(columnIndex + 2, rowIndex + 2)]
-            tile4 = board[(columnIndex + 3, rowIndex + 3)]
-            if tile1 == tile2 == tile3 == tile4 == playerTile:
-                return True
-
-            # Check for four-in-a-row going left-down diagonal:
-            tile1 = board[(columnIndex + 3, rowIndex)]
-            tile2 = board[(columnIndex + 2, rowIndex + 1)]
-            tile3 = board[(columnIndex + 1, rowIndex + 2)]
-            tile4 = board[(columnIndex, rowIndex + 3)]
-            if tile1 == tile2 == tile3 == tile4 == playerTile:
-                return True
+    # Go through every line on the board, checking for four-in-a-row (or
+    # however many in a row the board's BoardConfig needs). The config has
+    # already worked out where all the horizontal, vertical and diagonal
+    # lines are, so there's no coordinate arithmetic to do here:
+    for line in getBoardConfigOf(board).lines:
+        for space in line:
+            if board[space] != playerTile:
+                break # This line has a space that isn't playerTile's.
+        else:
+            return True # Every space in the line is playerTile's.
+    return False
+
+def isWinningMove(playerTile, board, move):
+    '''Returns True if the tile that 'playerTile' just dropped at 'move', a
+    (columnIndex, rowIndex) tuple, made a winning line on 'board'.
+
+    Unlike isWinner(), this only looks at the lines through 'move', which
+    are the only lines that dropping a tile there could have completed.'''
+    config = getBoardConfigOf(board)
+    width, height = config.width, config.height
+    columnIndex, rowIndex = move
+    for columnStep, rowStep in LINE_DIRECTIONS:
+        tilesInRow = 1 # The tile at 'move' itself.
+        for direction in (1, -1): # Count matching tiles on both sides of 'move'.
+            column = columnIndex + columnStep * direction
+            row = rowIndex + rowStep * direction
+            while 0 <= column < width and 0 <= row < height and board[(column, row)] == playerTile:
+                tilesInRow += 1
+                column += columnStep * direction
+                row += rowStep * direction
+        if tilesInRow >= config.connect:
+            return True
     return False
 
 # If this program was run (instead of imported), run the game:
@@ -0,0 +1,343 @@
+#! python3
+'''A computer player for Four-in-a-Row.
+
+AIPlayer searches the game tree with negamax and alpha-beta pruning on a
+BitBoard. It uses iterative deepening: it searches 1 move ahead, then 2,
+then 3, and so on until its time for the move runs out, and plays the
+best move from the deepest search that finished. Positions that have
+already been searched are kept in a transposition table keyed by the
+board's Zobrist hash, and moves are tried center column first, which is
+usually the strongest, so alpha-beta can cut off more of the tree.
+
+An AIPlayer can also be given an opening book (see fourinarowbook) to
+look positions up in before searching, and told to solve positions with
+few empty spaces perfectly with solvePosition(), writing the results
+back into the book.'''
+
+import time
+
+from fourinarow import PLAYER_O, PLAYER_X
+from fourinarowbitboard import BitBoard
+
+WIN_SCORE = 1_000_000 # Minus the number of moves it takes to win, so faster wins score higher.
+EXACT, LOWER_BOUND, UPPER_BOUND = 0, 1, 2 # Kinds of transposition table scores.
+NODES_BETWEEN_CLOCK_CHECKS = 1024
+
+# XORed into the Zobrist key when it is PLAYER_O's turn, since the same
+# tiles with a different player to move are a different position:
+_O_TO_MOVE_KEY = 0x9E3779B97F4A7C15
+
+class _OutOfTime(Exception):
+    '''Raised inside the search when the time for the move runs out.'''
+
+class TranspositionTable:
+    '''A fixed-size table of search results, indexed by Zobrist key.
+
+    Each key maps to one slot. When two positions want the same slot, the
+    new result replaces the old one if it comes from a search at least as
+    deep, or if the old result is left over from the search of an earlier
+    move. That keeps the expensive deep results around without letting
+    stale ones fill up the table.'''
+
+    def __init__(self, size=1 << 20):
+        self.size = size
+        self._keys = [None] * size
+        self._entries = [None] * size # (depth, score, kind, bestMove, generation) tuples.
+        self.generation = 0 # Goes up by one for each move searched.
+        self.probes = self.hits = 0
+
+    def newSearch(self):
+        '''Marks the entries stored so far as coming from an earlier search,
+        and starts counting probes and hits from zero.'''
+        self.generation += 1
+        self.probes = self.hits = 0
+
+    def lookup(self, key):
+        '''Returns the (depth, score, kind, bestMove, generation) entry for
+        key, or None if it isn't in the table.'''
+        self.probes += 1
+        slot = key % self.size
+        if self._keys[slot] == key:
+            self.hits += 1
+            return self._entries[slot]
+        return None
+
+    def store(self, key, depth, score, kind, bestMove):
+        slot = key % self.size
+        oldEntry = self._entries[slot]
+        if (oldEntry is None or self._keys[slot] == key or depth >= oldEntry[0]
+                or oldEntry[4] != self.generation):
+            self._keys[slot] = key
+            self._entries[slot] = (depth, score, kind, bestMove, self.generation)
+
+    @property
+    def hitRate(self):
+        return self.hits / self.probes if self.probes else 0.0
+
+class AIPlayer:
+    def __init__(self, timeLimit=1.0, maxDepth=None, tableSize=1 << 20, book=None, solveEmpties=0):
+        """Create a computer player that spends up to timeLimit seconds on
+        each move, and searches no more than maxDepth moves ahead (or as
+        deep as time allows, if maxDepth is None). If book is an
+        OpeningBook, moves are looked up there first. Positions with
+        solveEmpties or fewer empty spaces are solved perfectly, whatever
+        the time limit, and the results added to the book."""
+        self.timeLimit = timeLimit
+        self.maxDepth = maxDepth
+        self.table = TranspositionTable(tableSize)
+        self.book = book
+        self.solveEmpties = solveEmpties
+        # Statistics about the last move chosen:
+        self.nodes = 0
+        self.seconds = 0.0
+        self.depth = 0
+        self.score = 0
+        self.source = None # 'book', 'solver' or 'search'.
+
+    @property
+    def nodesPerSecond(self):
+        return self.nodes / self.seconds if self.seconds else 0.0
+
+    def chooseMove(self, playerTile, board):
+        """Returns the columnIndex that playerTile should drop a tile into
+        on board, which is a BitBoard or a dictionary board. Raises
+        ValueError if the board is full."""
+        if not isinstance(board, BitBoard):
+            board = BitBoard.fromDict(board)
+        else:
+            board = board.copy() # So the search doesn't change the caller's board.
+        if board.emptyCount == 0:
+            raise ValueError('no legal moves: the board is full')
+
+        if self.book is not None:
+            entry = self.book.lookup(board, playerTile)
+            if entry is not None:
+                self.nodes, self.seconds, self.depth, self.score, self.source = 0, 0.0, entry.depth, entry.result, 'book'
+                return entry.move
+        if board.emptyCount <= self.solveEmpties:
+            startTime = time.perf_counter()
+            score, move, self.nodes = solvePosition(board, playerTile)
+            self.seconds = time.perf_counter() - startTime
+            self.depth, self.score, self.source = board.emptyCount, score, 'solver'
+            if self.book is not None:
+                self.book.addSolved(board, playerTile, score, move)
+            return move
+
+        self.source = 'search'
+        self._board = board
+        self._columnOrder = sorted(range(board.width), key=lambda column: abs(2 * column - (board.width - 1)))
+        self._allSpaces = sum(((1 << board.height) - 1) << (column * (board.height + 1))
+                              for column in range(board.width))
+        self.table.newSearch()
+        self.nodes = 0
+        startTime = time.perf_counter()
+        self._deadline = startTime + self.timeLimit if self.timeLimit is not None else None
+
+        # Play a legal move even if not one search finishes in time:
+        bestMove = next(column for column in self._columnOrder if board.canPlay(column))
+        maxDepth = board.emptyCount if self.maxDepth is None else min(self.maxDepth, board.emptyCount)
+        self.depth = self.score = 0
+        try:
+            for depth in range(1, maxDepth + 1):
+                score, move = self._searchRoot(playerTile, depth)
+                bestMove, self.depth, self.score = move, depth, score
+                if abs(score) >= WIN_SCORE - board.width * board.height:
+                    break # Found a forced win or loss, so searching deeper won't change the move.
+        except _OutOfTime:
+            pass
+        self.seconds = time.perf_counter() - startTime
+        return bestMove
+
+    def _key(self, playerTile):
+        key = self._board.zobristKey
+        return key ^ _O_TO_MOVE_KEY if playerTile == PLAYER_O else key
+
+    def _orderedMoves(self, bestMove):
+        """Returns the columns to try, best move from the table first and
+        then from the center outward."""
+        if bestMove is None:
+            return self._columnOrder
+        return [bestMove] + [column for column in self._columnOrder if column != bestMove]
+
+    def _searchRoot(self, playerTile, depth):
+        board = self._board
+        otherTile = PLAYER_O if playerTile == PLAYER_X else PLAYER_X
+        entry = self.table.lookup(self._key(playerTile))
+        alpha, beta = -WIN_SCORE - 1, WIN_SCORE + 1
+        bestScore, bestMove = -WIN_SCORE - 1, None
+        for column in self._orderedMoves(entry[3] if entry else None):
+            if not board.canPlay(column):
+                continue
+            board.play(column, playerTile)
+            try:
+                if board.isWinner(playerTile):
+                    score = WIN_SCORE - 1
+                else:
+                    score = -self._negamax(otherTile, playerTile, depth - 1, -beta, -alpha, 1)
+            finally:
+                board.undo()
+            if score > bestScore:
+                bestScore, bestMove = score, column
+            alpha = max(alpha, score)
+        self.table.store(self._key(playerTile), depth, bestScore, EXACT, bestMove)
+        return bestScore, bestMove
+
+    def _negamax(self, playerTile, otherTile, depth, alpha, beta, ply):
+        """Returns the score of the board for playerTile, who is about to
+        move, searching depth moves ahead."""
+        self.nodes += 1
+        if self._deadline is not None and self.nodes % NODES_BETWEEN_CLOCK_CHECKS == 0 \
+                and time.perf_counter() > self._deadline:
+            raise _OutOfTime()
+        board = self._board
+        if board.tileCount == board.width * board.height:
+            return 0 # A tie.
+        if depth == 0:
+            return self._evaluate(playerTile)
+
+        key = self._key(playerTile)
+        entry = self.table.lookup(key)
+        bestMove = None
+        if entry is not None:
+            entryDepth, score, kind, bestMove, generation = entry
+            if entryDepth >= depth:
+                # Win scores are stored relative to this position, not the root:
+                if score > WIN_SCORE - 1000:
+                    score -= ply
+                elif score < -WIN_SCORE + 1000:
+                    score += ply
+                if kind == EXACT:
+                    return score
+                if kind == LOWER_BOUND and score >= beta:
+                    return score
+                if kind == UPPER_BOUND and score <= alpha:
+                    return score
+
+        originalAlpha = alpha
+        bestScore = -WIN_SCORE - 1
+        for column in self._orderedMoves(bestMove):
+            if not board.canPlay(column):
+                continue
+            board.play(column, playerTile)
+            try:
+                if board.isWinner(playerTile):
+                    score = WIN_SCORE - ply - 1
+                else:
+                    score = -self._negamax(otherTile, playerTile, depth - 1, -beta, -alpha, ply + 1)
+            finally:
+                board.undo()
+            if score > bestScore:
+                bestScore, bestMove = score, column
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break # The other player won't allow this position, so stop looking.
+
+        if bestScore <= originalAlpha:
+            kind = UPPER_BOUND
+        elif bestScore >= beta:
+            kind = LOWER_BOUND
+        else:
+            kind = EXACT
+        storedScore = bestScore
+        if storedScore > WIN_SCORE - 1000:
+            storedScore += ply
+        elif storedScore < -WIN_SCORE + 1000:
+            storedScore -= ply
+        self.table.store(key, depth, storedScore, kind, bestMove)
+        return bestScore
+
+    def _evaluate(self, playerTile):
+        """Scores a position the search didn't look past: each empty space
+        that would give a player four-in-a-row counts for that player, and
+        tiles in the center column count a little too. On boards where more
+        than four in a row is needed, four in a row is still a useful hint."""
+        board = self._board
+        player = 0 if playerTile == PLAYER_X else 1
+        mine, theirs = board.bitboards[player], board.bitboards[1 - player]
+        empty = self._allSpaces & ~(mine | theirs)
+        centerColumn = ((1 << board.height) - 1) << ((board.width // 2) * (board.height + 1))
+        return (4 * (_winningSpaces(mine, board.height) & empty).bit_count()
+                - 4 * (_winningSpaces(theirs, board.height) & empty).bit_count()
+                + (mine & centerColumn).bit_count() - (theirs & centerColumn).bit_count())
+
+def _winningSpaces(bits, height):
+    """Returns the bits of every space that would complete a line of four
+    with the tiles in bits, filled or not."""
+    # Vertical: three tiles right below the space.
+    spaces = (bits << 1) & (bits << 2) & (bits << 3)
+    for shift in (height + 1, height, height + 2): # Horizontal and the two diagonals.
+        pair = (bits << shift) & (bits << 2 * shift)
+        spaces |= pair & (bits << 3 * shift) # Three tiles on one side.
+        spaces |= pair & (bits >> shift) # Two on one side, one on the other.
+        pair = (bits >> shift) & (bits >> 2 * shift)
+        spaces |= pair & (bits << shift)
+        spaces |= pair & (bits >> 3 * shift)
+    return spaces
+
+def solvePosition(board, playerTile):
+    """Searches a BitBoard to the end of the game, which is only practical
+    with few empty spaces left. Returns (score, bestMove, nodes): score is
+    positive if playerTile, who moves next, wins with perfect play, negative
+    if they lose, and 0 for a tie. Its size is one more than the number of
+    empty spaces left after the winning tile, so faster wins score higher."""
+    board = board.copy()
+    columnOrder = sorted(range(board.width), key=lambda column: abs(2 * column - (board.width - 1)))
+    otherTile = PLAYER_O if playerTile == PLAYER_X else PLAYER_X
+    table = {}
+    nodes = 0
+
+    def negamax(playerTile, otherTile, alpha, beta):
+        nonlocal nodes
+        nodes += 1
+        empties = board.emptyCount
+        if empties == 0:
+            return 0, None # A tie.
+        for column in columnOrder:
+            if board.canPlay(column):
+                board.play(column, playerTile)
+                won = board.isWinner(playerTile)
+                board.undo()
+                if won:
+                    return empties, column
+        # Can't win with this move, so the best left is winning with the next one (or a tie):
+        beta = min(beta, max(empties - 2, 0))
+        if alpha >= beta:
+            return beta, None
+
+        key = board.zobristKey ^ _O_TO_MOVE_KEY if playerTile == PLAYER_O else board.zobristKey
+        entry = table.get(key)
+        bestMove = None
+        if entry is not None:
+            score, kind, bestMove = entry
+            if kind == EXACT or (kind == LOWER_BOUND and score >= beta) or (kind == UPPER_BOUND and score <= alpha):
+                return score, bestMove
+        originalAlpha = alpha
+        bestScore = -empties
+        moves = columnOrder if bestMove is None else [bestMove] + [c for c in columnOrder if c != bestMove]
+        for column in moves:
+            if not board.canPlay(column):
+                continue
+            board.play(column, playerTile)
+            score = -negamax(otherTile, playerTile, -beta, -alpha)[0]
+            board.undo()
+            if score > bestScore:
+                bestScore, bestMove = score, column
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        if bestScore <= originalAlpha:
+            kind = UPPER_BOUND
+        elif bestScore >= beta:
+            kind = LOWER_BOUND
+        else:
+            kind = EXACT
+        table[key] = (bestScore, kind, bestMove)
+        return bestScore, bestMove
+
+    empties = board.emptyCount
+    score, bestMove = negamax(playerTile, otherTile, -empties - 1, empties + 1)
+    if bestMove is None: # Every move loses equally fast, or the board is full.
+        bestMove = next((column for column in columnOrder if board.canPlay(column)), None)
+    return score, bestMove, nodes
@@ -0,0 +1,63 @@
+#! python3
+'''NumPy win checks for many Four-in-a-Row boards at once.
+
+For analyzing lots of positions (from fourinarowsim games, say), checking
+one board at a time spends most of its time in the Python interpreter.
+Here the boards are packed into one int8 array with a row per board and
+a column per space, in the flat order of BoardConfig.spaceIndex(), and
+every winning line of every board is checked with a few array
+operations using BoardConfig.lineIndexes.'''
+
+import functools
+
+import numpy as np
+
+from fourinarow import CONFIG_CACHE_SIZE, DEFAULT_CONFIG, EMPTY_SPACE, PLAYER_O, PLAYER_X, getBoardConfigOf
+
+# The values that stand for each tile in a boards array:
+TILE_VALUES = {EMPTY_SPACE: 0, PLAYER_X: 1, PLAYER_O: 2}
+NO_WINNER, X_WINS, O_WINS, BOTH_WIN = 0, 1, 2, 3
+
+BOARDS_PER_CHUNK = 1 << 15 # Keeps the (boards, lines, connect) temporary array small.
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _lineArray(config):
+    '''Returns config.lineIndexes as a (lines, connect) intp array.'''
+    return np.array(config.lineIndexes, dtype=np.intp).reshape(-1, config.connect)
+
+def boardsToArray(boards, config=None):
+    '''Returns a (len(boards), width * height) int8 array of boards, which
+    may be dictionary boards, BitBoards or FlatBoards of the same size.
+    Tiles are stored as the numbers in TILE_VALUES.'''
+    boards = list(boards)
+    if config is None:
+        config = getBoardConfigOf(boards[0]) if boards else DEFAULT_CONFIG
+    spaces = [(columnIndex, rowIndex) for rowIndex in range(config.height) for columnIndex in range(config.width)]
+    array = np.zeros((len(boards), len(spaces)), dtype=np.int8)
+    for boardNumber, board in enumerate(boards):
+        cells = getattr(board, 'cells', None) # FlatBoards already have their tiles in flat order.
+        if cells is None:
+            cells = [board[space] for space in spaces]
+        array[boardNumber] = [TILE_VALUES[tile] for tile in cells]
+    return array
+
+def batchIsWinner(boards, playerTile, config=DEFAULT_CONFIG):
+    '''Returns a bool array that is True for each row of the boards array
+    where playerTile has a winning line.'''
+    boards = np.asarray(boards)
+    if boards.ndim != 2 or boards.shape[1] != config.width * config.height:
+        raise ValueError(f'boards must be a (boards, {config.width * config.height}) array')
+    lines = _lineArray(config)
+    value = TILE_VALUES[playerTile]
+    result = np.empty(len(boards), dtype=bool)
+    for start in range(0, len(boards), BOARDS_PER_CHUNK):
+        chunk = boards[start:start + BOARDS_PER_CHUNK] == value # (boards, spaces)
+        # chunk[:, lines] is (boards, lines, connect): a line wins if all its spaces match.
+        result[start:start + BOARDS_PER_CHUNK] = chunk[:, lines].all(axis=2).any(axis=1)
+    return result
+
+def batchWinners(boards, config=DEFAULT_CONFIG):
+    '''Returns an int8 array with NO_WINNER, X_WINS, O_WINS, or BOTH_WIN
+    (which can't happen in a real game) for each row of the boards array.'''
+    return (batchIsWinner(boards, PLAYER_X, config).astype(np.int8) * X_WINS
+            + batchIsWinner(boards, PLAYER_O, config).astype(np.int8) * O_WINS)
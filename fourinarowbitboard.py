@@ -0,0 +1,195 @@
+#! python3
+'''A bitboard representation of a Four-in-a-Row board.
+
+Instead of a dictionary of 42 "X"/"O"/"." strings, a BitBoard keeps one
+int per player with a 1 bit for every tile that player has on the board,
+plus the number of tiles in each column. Each column takes BOARD_HEIGHT
++ 1 bits, bottom row first; the extra bit on top of each column is always
+0, so lines of tiles can't wrap around from one column into the next:
+
+    .  .  .  .  .  .  .     6 13 20 27 34 41 48   <- always 0
+    .  .  .  .  .  .  .     5 12 19 26 33 40 47   row 0 (the top row)
+    .  .  .  .  .  .  .     4 11 18 25 32 39 46
+    .  .  .  .  .  .  .     3 10 17 24 31 38 45
+    .  .  .  .  .  .  .     2  9 16 23 30 37 44
+    .  .  .  .  .  .  .     1  8 15 22 29 36 43
+    .  .  .  .  .  .  .     0  7 14 21 28 35 42   row 5 (the bottom row)
+
+Shifting a player's bits by 1 moves every tile one row up, by
+BOARD_HEIGHT + 1 one column over, and by BOARD_HEIGHT or BOARD_HEIGHT + 2
+one step along a diagonal, so four-in-a-row can be found with a few
+shifts and ANDs instead of looking at every window on the board. Python
+ints have no fixed size, so this works for boards of any size, and for
+winning runs longer than four.
+
+A BitBoard also works as a read-only mapping of (columnIndex, rowIndex)
+tuples to "X", "O" or ".", the same as the dictionary from
+fourinarow.getNewBoard(), and setting the lowest empty space of a column
+drops a tile there. So it can be passed to displayBoard(), getPlayerMove()
+and isWinner() in place of the dictionary.'''
+
+import collections.abc
+import functools
+import random
+
+from fourinarow import (BOARD_HEIGHT, BOARD_WIDTH, CONFIG_CACHE_SIZE, EMPTY_SPACE, PLAYER_O, PLAYER_X,
+                        getBoardConfig, getBoardConfigOf)
+
+TILES = (PLAYER_X, PLAYER_O)
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def getZobristTable(width, height):
+    """Returns the Zobrist keys for a board size: one random 64-bit int
+    for each player and space, in a list indexed by [player][bitIndex].
+    XORing together the keys of every tile on the board gives a hash of
+    the position that play() and undo() can update with one XOR. A fixed
+    seed keeps the keys, and so the hashes, the same from run to run."""
+    rng = random.Random(0x4F4E4E45)
+    return [[rng.getrandbits(64) for bitIndex in range(width * (height + 1))] for player in TILES]
+
+class BitBoard(collections.abc.Mapping):
+    def __init__(self, width=BOARD_WIDTH, height=BOARD_HEIGHT, connect=4):
+        """Create a new, empty BitBoard where connect tiles in a row win."""
+        self.config = getBoardConfig(width, height, connect)
+        self.width = width
+        self.height = height
+        self.connect = connect
+        self.bitboards = [0, 0] # The tiles of PLAYER_X and PLAYER_O.
+        self.heights = [0] * width # The number of tiles in each column.
+        self.moves = [] # The columns played so far, for undo().
+        self.tileCount = 0
+        self.zobristKey = 0 # A hash of the tiles on the board, see getZobristTable().
+        self._columnBits = height + 1
+        self._zobrist = getZobristTable(width, height)
+
+    @classmethod
+    def fromDict(cls, board):
+        """Create a BitBoard with the same tiles and BoardConfig as a
+        dictionary board from fourinarow.getNewBoard(). The order the tiles
+        were played in isn't known, so the moves list is left empty and
+        undo() can't go back past this position."""
+        config = getBoardConfigOf(board)
+        width, height = config.width, config.height
+        bitBoard = cls(width, height, config.connect)
+        for columnIndex in range(width):
+            for rowIndex in range(height - 1, -1, -1): # Bottom to top.
+                tile = board[(columnIndex, rowIndex)]
+                if tile == EMPTY_SPACE:
+                    break
+                bitIndex = columnIndex * bitBoard._columnBits + height - 1 - rowIndex
+                bitBoard.bitboards[TILES.index(tile)] |= 1 << bitIndex
+                bitBoard.zobristKey ^= bitBoard._zobrist[TILES.index(tile)][bitIndex]
+                bitBoard.heights[columnIndex] += 1
+                bitBoard.tileCount += 1
+        return bitBoard
+
+    def toDict(self):
+        """Returns a dictionary board like the one fourinarow.getNewBoard() makes."""
+        return dict(self.items())
+
+    def copy(self):
+        """Returns a new BitBoard with the same tiles and move history."""
+        bitBoard = BitBoard(self.width, self.height, self.connect)
+        bitBoard.bitboards = self.bitboards[:]
+        bitBoard.heights = self.heights[:]
+        bitBoard.moves = self.moves[:]
+        bitBoard.tileCount = self.tileCount
+        bitBoard.zobristKey = self.zobristKey
+        return bitBoard
+
+    def _bit(self, columnIndex, rowIndex):
+        """Returns the bit for the space at (columnIndex, rowIndex), where
+        rowIndex 0 is the top row like in the dictionary board."""
+        return 1 << (columnIndex * self._columnBits + self.height - 1 - rowIndex)
+
+    @property
+    def mask(self):
+        """The bits of every tile on the board, from both players."""
+        return self.bitboards[0] | self.bitboards[1]
+
+    def canPlay(self, columnIndex):
+        """Returns True if columnIndex has room for another tile."""
+        return self.heights[columnIndex] < self.height
+
+    def play(self, columnIndex, tile):
+        """Drops tile ("X" or "O") into columnIndex. Returns the
+        (columnIndex, rowIndex) the tile lands in."""
+        if not self.canPlay(columnIndex):
+            raise ValueError(f'column {columnIndex} is full')
+        rowIndex = self.height - 1 - self.heights[columnIndex]
+        player = TILES.index(tile)
+        bitIndex = columnIndex * self._columnBits + self.heights[columnIndex]
+        self.bitboards[player] |= 1 << bitIndex
+        self.zobristKey ^= self._zobrist[player][bitIndex]
+        self.heights[columnIndex] += 1
+        self.tileCount += 1
+        self.moves.append(columnIndex)
+        return (columnIndex, rowIndex)
+
+    def undo(self):
+        """Takes back the last tile played. Returns its column."""
+        columnIndex = self.moves.pop()
+        self.heights[columnIndex] -= 1
+        self.tileCount -= 1
+        bitIndex = columnIndex * self._columnBits + self.heights[columnIndex]
+        player = 0 if self.bitboards[0] >> bitIndex & 1 else 1
+        self.bitboards[player] &= ~(1 << bitIndex)
+        self.zobristKey ^= self._zobrist[player][bitIndex]
+        return columnIndex
+
+    def isWinner(self, tile):
+        """Returns True if tile ("X" or "O") has four (or connect) tiles in a row."""
+        bits = self.bitboards[TILES.index(tile)]
+        # Vertical, horizontal, and the two diagonals:
+        for shift in (1, self._columnBits, self._columnBits - 1, self._columnBits + 1):
+            # After each step, runs has a 1 bit where a run of runLength tiles
+            # starts. ANDing runs with itself shifted along by runLength tiles
+            # doubles the run length, so only about log2(connect) steps are needed:
+            runs, runLength = bits, 1
+            while runs and runLength < self.connect:
+                step = min(runLength, self.connect - runLength)
+                runs &= runs >> (step * shift)
+                runLength += step
+            if runs:
+                return True
+        return False
+
+    @property
+    def emptyCount(self):
+        """The number of empty spaces, which fourinarow.isFull() uses."""
+        return self.width * self.height - self.tileCount
+
+    def isFull(self):
+        """Returns True if every column is full."""
+        return self.tileCount == self.width * self.height
+
+    # Mapping methods, so a BitBoard can stand in for the dictionary board:
+    def __getitem__(self, space):
+        columnIndex, rowIndex = space
+        if not (0 <= columnIndex < self.width and 0 <= rowIndex < self.height):
+            raise KeyError(space)
+        bit = self._bit(columnIndex, rowIndex)
+        if self.bitboards[0] & bit:
+            return PLAYER_X
+        if self.bitboards[1] & bit:
+            return PLAYER_O
+        return EMPTY_SPACE
+
+    def __setitem__(self, space, tile):
+        """Drops tile into the space's column. Like in main(), the space
+        must be the lowest empty space of its column."""
+        columnIndex, rowIndex = space
+        if not (0 <= columnIndex < self.width) or rowIndex != self.height - 1 - self.heights[columnIndex]:
+            raise ValueError(f'{space} is not the lowest empty space of its column')
+        self.play(columnIndex, tile)
+
+    def __iter__(self):
+        for rowIndex in range(self.height):
+            for columnIndex in range(self.width):
+                yield (columnIndex, rowIndex)
+
+    def __len__(self):
+        return self.width * self.height
+
+    def __repr__(self):
+        return f'{self.__class__.__qualname__}.fromDict({self.toDict()!r})'
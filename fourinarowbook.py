@@ -0,0 +1,332 @@
+#! python3
+'''An opening book for Four-in-a-Row, kept in a memory-mapped file.
+
+The book maps positions to the move to play in them. A position's key is
+built from its BitBoard: the bits of X's tiles plus the bits of every
+tile, which is different for every position because the tiles in each
+column are stacked from the bottom. A position and its mirror image
+(flipped left to right) have the same best move, flipped, so the key is
+the smaller of the two keys, which halves the size of the book. The
+lowest bit of the key says whose turn it is.
+
+A book file starts with a 16-byte header:
+
+    magic    4 bytes  b'C4BK'
+    version  1 byte   1
+    width    1 byte   board width
+    height   1 byte   board height
+    connect  1 byte   tiles in a row that win
+    keySize  1 byte   bytes in each key
+    reserved 3 bytes  0
+    count    4 bytes  number of records
+
+followed by count records sorted by key. Each record is the key, as a
+keySize-byte big-endian number so sorting the bytes sorts the keys,
+followed by four bytes: result, move, depth, and flags. lookup() finds a
+record by binary search in the memory-mapped file, so opening even a big
+book is instant. New entries are kept in memory until save() merges them
+into the file.
+
+The default book is fourinarow.book in the user's cache directory
+($XDG_CACHE_HOME or ~/.cache, or %LOCALAPPDATA% on Windows), not next to
+this module, so playing never writes into the source tree.
+
+Usage: python fourinarowbook.py BOOK [--plies N] [--depth N] [--endgames N] [--solve-empties N]
+       [--seed N] [--width N] [--height N] [--connect N]'''
+
+import argparse
+import collections
+import mmap
+import os
+import random
+import struct
+import time
+
+import fourinarow
+from fourinarow import DEFAULT_CONFIG, PLAYER_O, PLAYER_X
+from fourinarowbitboard import BitBoard
+
+MAGIC = b'C4BK'
+VERSION = 1
+
+def _getCacheDir():
+    '''Returns the directory the user's programs keep cached data in.'''
+    if os.name == 'nt':
+        return os.environ.get('LOCALAPPDATA') or os.path.expanduser(os.path.join('~', 'AppData', 'Local'))
+    return os.environ.get('XDG_CACHE_HOME') or os.path.expanduser(os.path.join('~', '.cache'))
+
+DEFAULT_BOOK_PATH = os.path.join(_getCacheDir(), 'fourinarow', 'fourinarow.book')
+SOLVE_EMPTIES = 16 # Positions with this many empty spaces or fewer solve in well under a second.
+
+SEARCHED, SOLVED = 1, 2 # Flags: the move comes from a search to depth moves, or from solving the position.
+
+_HEADER = struct.Struct('<4sBBBBB3xI')
+_VALUE = struct.Struct('>bBBB')
+
+BookEntry = collections.namedtuple('BookEntry', 'move result depth flags')
+BookEntry.__doc__ = '''One position in the book. move is the column to play. For SOLVED
+entries, result is the solvePosition() score (clipped to -127..127) and
+depth the number of empty spaces; for SEARCHED entries, result is 0 and
+depth is how many moves ahead the search looked.'''
+
+def _mirrorBits(bits, width, columnBits):
+    '''Returns bits with its columns in reverse order.'''
+    columnMask = (1 << columnBits) - 1
+    mirrored = 0
+    for columnIndex in range(width):
+        mirrored = (mirrored << columnBits) | ((bits >> (columnIndex * columnBits)) & columnMask)
+    return mirrored
+
+def positionKey(board, playerTile):
+    '''Returns (key, mirrored) for a BitBoard where it is playerTile's
+    turn. mirrored is True if the key is the key of the board's mirror
+    image, so book moves for it have to be flipped.'''
+    # A column's tiles fill its low bits, so X's bits plus the mask can't carry into the next column:
+    key = board.bitboards[0] + board.mask
+    mirrorKey = _mirrorBits(key, board.width, board.height + 1)
+    turn = playerTile == PLAYER_O
+    if mirrorKey < key:
+        return mirrorKey << 1 | turn, True
+    return key << 1 | turn, False
+
+class OpeningBook:
+    def __init__(self, path=DEFAULT_BOOK_PATH, config=DEFAULT_CONFIG):
+        """Open the book at path, or start an empty one if there is no
+        file there yet. The book can only be used for boards of config's
+        size."""
+        self.path = path
+        self.config = config
+        self.keySize = (config.width * (config.height + 1) + 1 + 7) // 8
+        self.recordSize = self.keySize + _VALUE.size
+        self._pending = {} # Entries added since the last save(), by key.
+        self._file = self._mmap = None
+        self._count = 0
+        self._open()
+
+    def _open(self):
+        if not os.path.exists(self.path):
+            return
+        self._file = open(self.path, 'rb')
+        if os.fstat(self._file.fileno()).st_size < _HEADER.size: # mmap can't map an empty file.
+            self.close()
+            raise ValueError(f'{self.path} is not an opening book: too short')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, width, height, connect, keySize, count = _HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f'{self.path} is not a version {VERSION} opening book')
+        if (width, height, connect) != (self.config.width, self.config.height, self.config.connect):
+            self.close()
+            raise ValueError(f'{self.path} is a book for {width}x{height} boards with {connect} in a row')
+        if keySize != self.keySize:
+            self.close()
+            raise ValueError(f'{self.path} has {keySize}-byte keys, not {self.keySize}-byte keys')
+        size, neededSize = len(self._mmap), _HEADER.size + count * self.recordSize
+        if size < neededSize:
+            # Searching a truncated book would miss entries, and save() would copy the damage:
+            self.close()
+            raise ValueError(f'{self.path} is truncated: {count} records need {neededSize} bytes, but there are {size}')
+        self._count = count
+
+    def close(self):
+        """Closes the book file. Entries that weren't saved are lost."""
+        if self._mmap is not None:
+            self._mmap.close()
+        if self._file is not None:
+            self._file.close()
+        self._mmap = self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __len__(self):
+        """The number of positions in the file, not counting unsaved ones."""
+        return self._count
+
+    def _findRecord(self, keyBytes):
+        '''Returns the offset of the record with keyBytes in the file, or None.'''
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = _HEADER.size + middle * self.recordSize
+            middleKey = self._mmap[offset:offset + self.keySize]
+            if middleKey < keyBytes:
+                low = middle + 1
+            elif middleKey > keyBytes:
+                high = middle
+            else:
+                return offset
+        return None
+
+    def _lookupKey(self, key):
+        entry = self._pending.get(key)
+        if entry is not None or self._mmap is None:
+            return entry
+        offset = self._findRecord(key.to_bytes(self.keySize, 'big'))
+        if offset is None:
+            return None
+        result, move, depth, flags = _VALUE.unpack_from(self._mmap, offset + self.keySize)
+        return BookEntry(move, result, depth, flags)
+
+    def lookup(self, board, playerTile):
+        """Returns the BookEntry for playerTile's move on board (a BitBoard
+        or a dictionary board), or None if the position isn't in the book."""
+        if not isinstance(board, BitBoard):
+            board = BitBoard.fromDict(board)
+        key, mirrored = positionKey(board, playerTile)
+        entry = self._lookupKey(key)
+        if entry is not None and mirrored:
+            entry = entry._replace(move=board.width - 1 - entry.move)
+        return entry
+
+    def add(self, board, playerTile, move, result=0, depth=0, flags=SEARCHED):
+        """Adds a position to the book, unless it already has an entry
+        that is at least as good: solved beats searched, and a deeper
+        search beats a shallower one. Returns True if it was added."""
+        key, mirrored = positionKey(board, playerTile)
+        entry = BookEntry(board.width - 1 - move if mirrored else move, max(-127, min(127, result)),
+                          min(depth, 255), flags)
+        oldEntry = self._lookupKey(key)
+        if oldEntry is None or (entry.flags, entry.depth) > (oldEntry.flags, oldEntry.depth):
+            self._pending[key] = entry
+            return True
+        return False
+
+    def addSolved(self, board, playerTile, score, move):
+        """Adds the result of fourinarowai.solvePosition() to the book."""
+        return self.add(board, playerTile, move, score, board.emptyCount, SOLVED)
+
+    def save(self):
+        """Merges the entries added since the last save into the file."""
+        if not self._pending:
+            return
+        pending = sorted((key.to_bytes(self.keySize, 'big'), entry) for key, entry in self._pending.items())
+        tempPath = self.path + '.tmp'
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        count = 0
+        with open(tempPath, 'wb') as bookFile:
+            bookFile.write(bytes(_HEADER.size)) # Filled in once the count is known.
+            # Both the file's records and the pending ones are sorted, so merge them in one pass:
+            pendingIndex = 0
+            buffer = bytearray()
+            for recordIndex in range(self._count):
+                offset = _HEADER.size + recordIndex * self.recordSize
+                keyBytes = self._mmap[offset:offset + self.keySize]
+                while pendingIndex < len(pending) and pending[pendingIndex][0] < keyBytes:
+                    buffer += pending[pendingIndex][0] + _VALUE.pack(*_toValue(pending[pendingIndex][1]))
+                    pendingIndex += 1
+                    count += 1
+                if pendingIndex < len(pending) and pending[pendingIndex][0] == keyBytes:
+                    pendingIndex += 1 # add() only keeps pending entries that are better than the file's.
+                    keyBytes, entry = pending[pendingIndex - 1]
+                    buffer += keyBytes + _VALUE.pack(*_toValue(entry))
+                else:
+                    buffer += self._mmap[offset:offset + self.recordSize]
+                count += 1
+                if len(buffer) >= 1 << 20:
+                    bookFile.write(buffer)
+                    buffer.clear()
+            for keyBytes, entry in pending[pendingIndex:]:
+                buffer += keyBytes + _VALUE.pack(*_toValue(entry))
+                count += 1
+            bookFile.write(buffer)
+            bookFile.seek(0)
+            bookFile.write(_HEADER.pack(MAGIC, VERSION, self.config.width, self.config.height,
+                                        self.config.connect, self.keySize, count))
+        self.close()
+        os.replace(tempPath, self.path)
+        self._pending.clear()
+        self._open()
+
+def _toValue(entry):
+    return entry.result, entry.move, entry.depth, entry.flags
+
+def openingPositions(plies, config=DEFAULT_CONFIG):
+    '''Yields (board, playerTile) for every position reachable in up to
+    plies moves with no winner yet, skipping mirror images of positions
+    already yielded. Boards are BitBoards.'''
+    seen = set()
+    frontier = [BitBoard(config.width, config.height, config.connect)]
+    for ply in range(plies + 1):
+        playerTile = PLAYER_X if ply % 2 == 0 else PLAYER_O
+        nextFrontier = []
+        for board in frontier:
+            key = positionKey(board, playerTile)[0]
+            if key in seen:
+                continue
+            seen.add(key)
+            yield board, playerTile
+            for columnIndex in range(board.width):
+                if board.canPlay(columnIndex):
+                    child = board.copy()
+                    child.play(columnIndex, playerTile)
+                    if not child.isWinner(playerTile) and not child.isFull():
+                        nextFrontier.append(child)
+        frontier = nextFrontier
+
+def buildBook(book, plies=4, depth=8, endgames=0, solveEmpties=SOLVE_EMPTIES, seed=0, progress=None):
+    '''Adds every opening position up to plies moves deep to book, searched
+    depth moves ahead, then plays endgames games between fast computer
+    players and solves their positions once they have solveEmpties empty
+    spaces or fewer. Calls progress(message) now and then if given.
+    Saves the book and returns the number of positions added.'''
+    import fourinarowai # Imported here, since fourinarowai doesn't need this module.
+    config = book.config
+    added = 0
+    player = fourinarowai.AIPlayer(None, depth)
+    for board, playerTile in openingPositions(plies, config):
+        entry = book.lookup(board, playerTile)
+        if entry is not None and (entry.flags, entry.depth) >= (SEARCHED, depth):
+            continue
+        move = player.chooseMove(playerTile, board)
+        added += book.add(board, playerTile, move, 0, player.depth, SEARCHED)
+        if progress and added % 100 == 0:
+            progress(f'{added:,} opening positions searched')
+
+    rng = random.Random(seed)
+    fastPlayer = fourinarowai.AIPlayer(None, 2, 1 << 14)
+    for gameNumber in range(endgames):
+        board, playerTile = BitBoard(config.width, config.height, config.connect), PLAYER_X
+        while True:
+            if board.emptyCount <= solveEmpties:
+                score, move, nodes = fourinarowai.solvePosition(board, playerTile)
+                added += book.addSolved(board, playerTile, score, move)
+            elif rng.random() < 0.25: # Some random moves, so the games differ.
+                move = rng.choice([column for column in range(board.width) if board.canPlay(column)])
+            else:
+                move = fastPlayer.chooseMove(playerTile, board)
+            board.play(move, playerTile)
+            if board.isWinner(playerTile) or board.isFull():
+                break
+            playerTile = PLAYER_O if playerTile == PLAYER_X else PLAYER_X
+        if progress and (gameNumber + 1) % 10 == 0:
+            progress(f'{gameNumber + 1:,} endgames solved')
+    book.save()
+    return added
+
+def main():
+    parser = argparse.ArgumentParser(description='Build or extend a Four-in-a-Row opening book.')
+    parser.add_argument('book', nargs='?', default=DEFAULT_BOOK_PATH)
+    parser.add_argument('--plies', type=int, default=4, help='add every opening up to this many moves')
+    parser.add_argument('--depth', type=int, default=8, help='how many moves ahead to search openings')
+    parser.add_argument('--endgames', type=int, default=0, help='number of games to solve endgames from')
+    parser.add_argument('--solve-empties', type=int, default=SOLVE_EMPTIES,
+                        help='solve endgame positions with this many empty spaces or fewer')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--width', type=int, default=fourinarow.BOARD_WIDTH)
+    parser.add_argument('--height', type=int, default=fourinarow.BOARD_HEIGHT)
+    parser.add_argument('--connect', type=int, default=4, help='number of tiles in a row that wins')
+    args = parser.parse_args()
+
+    config = fourinarow.getBoardConfig(args.width, args.height, args.connect)
+    startTime = time.perf_counter()
+    with OpeningBook(args.book, config) as book:
+        added = buildBook(book, args.plies, args.depth, args.endgames, args.solve_empties, args.seed, print)
+        print(f'Added {added:,} positions in {time.perf_counter() - startTime:.1f} seconds; '
+              f'{args.book} has {len(book):,} positions.')
+
+if __name__ == '__main__':
+    main()
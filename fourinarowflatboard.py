@@ -0,0 +1,94 @@
+#! python3
+'''A flat, list-based layout of a Four-in-a-Row board.
+
+A FlatBoard keeps its tiles in one list, indexed left to right and top to
+bottom (see BoardConfig.spaceIndex()). Win checks use the line tables
+that the board's BoardConfig works out once per board size: isWinner()
+goes through lineIndexes, and isWinningMove() only looks at the lines in
+spaceLines for the space that was just played.
+
+Like BitBoard, a FlatBoard also works as a mapping of (columnIndex,
+rowIndex) tuples to "X", "O" or ".", so it can be passed to
+fourinarow.displayBoard(), getPlayerMove() and the other functions in
+place of the dictionary board.'''
+
+import collections.abc
+
+from fourinarow import DEFAULT_CONFIG, EMPTY_SPACE, getBoardConfigOf
+
+class FlatBoard(collections.abc.MutableMapping):
+    def __init__(self, config=DEFAULT_CONFIG):
+        """Create a new, empty FlatBoard of the size given by config."""
+        self.config = config
+        self.cells = [EMPTY_SPACE] * (config.width * config.height)
+        self.emptyCount = len(self.cells)
+
+    @classmethod
+    def fromDict(cls, board):
+        """Create a FlatBoard with the same tiles and BoardConfig as a
+        dictionary board from fourinarow.getNewBoard()."""
+        config = getBoardConfigOf(board)
+        flatBoard = cls(config)
+        for rowIndex in range(config.height):
+            for columnIndex in range(config.width):
+                flatBoard[(columnIndex, rowIndex)] = board[(columnIndex, rowIndex)]
+        return flatBoard
+
+    def toDict(self):
+        """Returns a dictionary board like the one fourinarow.getNewBoard() makes."""
+        return dict(self.items())
+
+    def isWinner(self, playerTile):
+        """Returns True if playerTile has a winning line anywhere on the board."""
+        cells = self.cells
+        for line in self.config.lineIndexes:
+            for index in line:
+                if cells[index] != playerTile:
+                    break
+            else:
+                return True
+        return False
+
+    def isWinningMove(self, playerTile, move):
+        """Returns True if the tile at move, a (columnIndex, rowIndex)
+        tuple, is part of a winning line for playerTile."""
+        cells, lineIndexes = self.cells, self.config.lineIndexes
+        for lineNumber in self.config.spaceLines[self.config.spaceIndex(move)]:
+            for index in lineIndexes[lineNumber]:
+                if cells[index] != playerTile:
+                    break
+            else:
+                return True
+        return False
+
+    def isFull(self):
+        return self.emptyCount == 0
+
+    # Mapping methods, so a FlatBoard can stand in for the dictionary board:
+    def __getitem__(self, space):
+        columnIndex, rowIndex = space
+        if not (0 <= columnIndex < self.config.width and 0 <= rowIndex < self.config.height):
+            raise KeyError(space)
+        return self.cells[rowIndex * self.config.width + columnIndex]
+
+    def __setitem__(self, space, tile):
+        columnIndex, rowIndex = space
+        if not (0 <= columnIndex < self.config.width and 0 <= rowIndex < self.config.height):
+            raise KeyError(space)
+        index = rowIndex * self.config.width + columnIndex
+        self.emptyCount += (tile == EMPTY_SPACE) - (self.cells[index] == EMPTY_SPACE)
+        self.cells[index] = tile
+
+    def __delitem__(self, space):
+        raise TypeError("spaces can't be removed from a FlatBoard")
+
+    def __iter__(self):
+        for rowIndex in range(self.config.height):
+            for columnIndex in range(self.config.width):
+                yield (columnIndex, rowIndex)
+
+    def __len__(self):
+        return len(self.cells)
+
+    def __repr__(self):
+        return f'{self.__class__.__qualname__}.fromDict({self.toDict()!r})'
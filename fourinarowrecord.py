@@ -0,0 +1,272 @@
+#! python3
+'''A compact log of Four-in-a-Row games, with replay and a position index.
+
+A game log file starts with an 8-byte header:
+
+    magic    4 bytes  b'C4GL'
+    version  1 byte   1
+    width    1 byte   board width, 8 at most
+    height   1 byte   board height
+    connect  1 byte   tiles in a row that win
+
+followed by one record per game, appended as games finish. A record is a
+2-byte move count, a 1-byte result (TIE, X_WINS, O_WINS or UNFINISHED),
+and the columns played, 3 bits each, packed into as few bytes as they
+fit in. A 42-move game takes 19 bytes.
+
+GameLog reads a log and follows each game once, on bitboards, to index
+it. While doing that it keeps a snapshot of the position every
+SNAPSHOT_INTERVAL moves, so positionAt() only replays the few moves after
+the nearest snapshot, and notes every position each game reached, so
+gamesReaching() can find them. replay() and positionAt() play the moves
+on a dictionary board with getDropSpace(), the same as the game does.
+
+Positions are keyed the way a BitBoard would store them: the bits of X's
+tiles plus the bits of every tile, which is different for every position.
+
+Usage: python fourinarowrecord.py LOG [--game N] [--move N]'''
+
+import argparse
+import array
+import collections
+import mmap
+import os
+import struct
+
+import fourinarow
+from fourinarow import DEFAULT_CONFIG, EMPTY_SPACE, PLAYER_O, PLAYER_X, getBoardConfigOf
+
+MAGIC = b'C4GL'
+VERSION = 1
+MAX_WIDTH = 8 # Columns 0 to 7 fit in 3 bits.
+SNAPSHOT_INTERVAL = 8
+TIE, X_WINS, O_WINS, UNFINISHED = 0, 1, 2, 3
+RESULTS = {None: TIE, PLAYER_X: X_WINS, PLAYER_O: O_WINS}
+
+_HEADER = struct.Struct('<4sBBBB')
+_RECORD = struct.Struct('<HB')
+
+def encodeGame(moves, result):
+    '''Returns the log record for a game: moves is a list of the columns
+    played, and result is TIE, X_WINS, O_WINS or UNFINISHED.'''
+    packed = 0
+    for moveNumber, columnIndex in enumerate(moves):
+        packed |= columnIndex << (3 * moveNumber)
+    return _RECORD.pack(len(moves), result) + packed.to_bytes((3 * len(moves) + 7) // 8, 'little')
+
+def decodeGame(data, offset=0):
+    '''Returns (moves, result, nextOffset) for the record at offset in data.'''
+    moveCount, result = _RECORD.unpack_from(data, offset)
+    start = offset + _RECORD.size
+    end = start + (3 * moveCount + 7) // 8
+    packed = int.from_bytes(data[start:end], 'little')
+    return [(packed >> (3 * moveNumber)) & 7 for moveNumber in range(moveCount)], result, end
+
+def positionKey(board):
+    '''Returns the key of a board's position, which may be a dictionary
+    board, a FlatBoard or a BitBoard.'''
+    config = getBoardConfigOf(board)
+    columnBits = config.height + 1
+    key = 0
+    for columnIndex in range(config.width):
+        tileCount = xBits = 0
+        for rowIndex in range(config.height - 1, -1, -1): # Bottom to top.
+            tile = board[(columnIndex, rowIndex)]
+            if tile == EMPTY_SPACE:
+                break
+            if tile == PLAYER_X:
+                xBits |= 1 << tileCount
+            tileCount += 1
+        key |= ((1 << tileCount) - 1 + xBits) << (columnIndex * columnBits)
+    return key
+
+def boardFromKey(key, config=DEFAULT_CONFIG):
+    '''Returns a new dictionary board with the position that key stands for.'''
+    board = fourinarow.getNewBoard(config)
+    columnBits = config.height + 1
+    for columnIndex in range(config.width):
+        column = (key >> (columnIndex * columnBits)) & ((1 << columnBits) - 1)
+        # A column with n tiles is 2**n - 1 plus X's bits, which is less than 2**(n + 1) - 1:
+        tileCount = (column + 1).bit_length() - 1
+        xBits = column - ((1 << tileCount) - 1)
+        for height in range(tileCount):
+            board[(columnIndex, config.height - 1 - height)] = PLAYER_X if xBits >> height & 1 else PLAYER_O
+    return board
+
+def _checkConfig(config):
+    if config.width > MAX_WIDTH:
+        raise ValueError(f'game logs store columns in 3 bits, so boards can be at most {MAX_WIDTH} wide')
+
+class GameRecorder:
+    def __init__(self, path, config=DEFAULT_CONFIG):
+        """Open the game log at path for appending, creating it if needed."""
+        _checkConfig(config)
+        self.config = config
+        isNew = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not isNew:
+            _readHeader(path, config)
+        self._file = open(path, 'ab')
+        if isNew:
+            self._file.write(_HEADER.pack(MAGIC, VERSION, config.width, config.height, config.connect))
+
+    def record(self, moves, winner=None, finished=True):
+        """Appends a game to the log: moves is a list of the columns
+        played, and winner is PLAYER_X, PLAYER_O or None for a tie."""
+        self._file.write(encodeGame(moves, RESULTS[winner] if finished else UNFINISHED))
+
+    def recordMany(self, records):
+        """Appends records made by encodeGame(), with one write."""
+        self._file.write(b''.join(records))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+def _readHeader(path, config=None):
+    '''Returns the BoardConfig of the log at path, checking that it is the
+    same as config if config is given.'''
+    with open(path, 'rb') as logFile:
+        header = logFile.read(_HEADER.size)
+    if len(header) != _HEADER.size:
+        raise ValueError(f'{path} is not a game log')
+    magic, version, width, height, connect = _HEADER.unpack(header)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f'{path} is not a version {VERSION} game log')
+    logConfig = fourinarow.getBoardConfig(width, height, connect)
+    if config is not None and logConfig != config:
+        raise ValueError(f'{path} is a log of {width}x{height} games with {connect} in a row')
+    return logConfig
+
+class GameLog:
+    def __init__(self, path):
+        """Open and index the game log at path."""
+        self.path = path
+        self.config = _readHeader(path)
+        self._mmap = None
+        self._end = _HEADER.size # Where the records not yet indexed start.
+        self._offsets = array.array('Q') # The offset of each game's record.
+        self._snapshots = [] # For each game, the position key every SNAPSHOT_INTERVAL moves.
+        self._gamesByPosition = collections.defaultdict(lambda: array.array('I'))
+        self.refresh()
+
+    def refresh(self):
+        """Indexes the games appended to the log since it was opened or
+        last refreshed. Returns the number of new games."""
+        with open(self.path, 'rb') as logFile:
+            size = os.fstat(logFile.fileno()).st_size
+            if size == self._end:
+                return 0
+            if self._mmap is not None:
+                self._mmap.close()
+            self._mmap = mmap.mmap(logFile.fileno(), 0, access=mmap.ACCESS_READ)
+        columnBits = self.config.height + 1
+        firstGame = len(self._offsets)
+        offset = self._end
+        while offset + _RECORD.size <= size:
+            # A writer may be partway through appending the last record, so
+            # leave it for the next refresh() unless all of it is there:
+            moveCount = _RECORD.unpack_from(self._mmap, offset)[0]
+            if offset + _RECORD.size + (3 * moveCount + 7) // 8 > size:
+                break
+            gameNumber = len(self._offsets)
+            moves, result, nextOffset = decodeGame(self._mmap, offset)
+            # Follow the game on bitboards, which is all the index needs:
+            xBits = mask = 0
+            positions = [0]
+            for moveNumber, columnIndex in enumerate(moves, start=1):
+                # The lowest empty bit of a column is the column's bits plus its bottom bit:
+                bottom = 1 << (columnIndex * columnBits)
+                bit = (mask + bottom) & ~mask & (((1 << self.config.height) - 1) * bottom)
+                if not bit:
+                    raise ValueError(f'game {gameNumber} plays in full column {columnIndex}')
+                mask |= bit
+                if moveNumber % 2 == 1:
+                    xBits |= bit
+                positions.append(xBits + mask)
+            # Only index the game once all of it has been read and checked:
+            self._offsets.append(offset)
+            self._snapshots.append(tuple(positions[::SNAPSHOT_INTERVAL]))
+            for key in positions:
+                self._gamesByPosition[key].append(gameNumber)
+            offset = self._end = nextOffset
+        return len(self._offsets) - firstGame
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._offsets)
+
+    def moves(self, gameNumber):
+        """Returns the list of columns played in a game."""
+        return decodeGame(self._mmap, self._offsets[gameNumber])[0]
+
+    def result(self, gameNumber):
+        """Returns TIE, X_WINS, O_WINS or UNFINISHED for a game."""
+        return _RECORD.unpack_from(self._mmap, self._offsets[gameNumber])[1]
+
+    def replay(self, gameNumber):
+        """Yields (move, board) after each move of a game, where move is the
+        (columnIndex, rowIndex) played. The same board is changed and
+        yielded each time, so copy it to keep a position."""
+        board = fourinarow.getNewBoard(self.config)
+        playerTurn = PLAYER_X
+        for columnIndex in self.moves(gameNumber):
+            move = fourinarow.getDropSpace(board, columnIndex)
+            if move is None:
+                raise ValueError(f'game {gameNumber} plays in full column {columnIndex}')
+            board[move] = playerTurn
+            yield move, board
+            playerTurn = PLAYER_O if playerTurn == PLAYER_X else PLAYER_X
+
+    def positionAt(self, gameNumber, moveNumber):
+        """Returns a new dictionary board with the position after the first
+        moveNumber moves of a game, replaying at most SNAPSHOT_INTERVAL - 1
+        moves from the nearest snapshot before it."""
+        moves = self.moves(gameNumber)
+        if not 0 <= moveNumber <= len(moves):
+            raise IndexError(f'game {gameNumber} has {len(moves)} moves, not {moveNumber}')
+        snapshotNumber = moveNumber // SNAPSHOT_INTERVAL
+        board = boardFromKey(self._snapshots[gameNumber][snapshotNumber], self.config)
+        for moveIndex in range(snapshotNumber * SNAPSHOT_INTERVAL, moveNumber):
+            board[fourinarow.getDropSpace(board, moves[moveIndex])] = PLAYER_X if moveIndex % 2 == 0 else PLAYER_O
+        return board
+
+    def gamesReaching(self, board):
+        """Returns a list of the numbers of every game that reached the
+        position on board."""
+        games = self._gamesByPosition.get(positionKey(board))
+        return list(games) if games is not None else []
+
+def main():
+    parser = argparse.ArgumentParser(description='Show a position from a Four-in-a-Row game log.')
+    parser.add_argument('log')
+    parser.add_argument('--game', type=int, default=0)
+    parser.add_argument('--move', type=int, default=None, help='default: the end of the game')
+    args = parser.parse_args()
+
+    with GameLog(args.log) as gameLog:
+        moves = gameLog.moves(args.game)
+        moveNumber = len(moves) if args.move is None else args.move
+        board = gameLog.positionAt(args.game, moveNumber)
+        fourinarow.displayBoard(board)
+        result = ('tie', 'X won', 'O won', 'unfinished')[gameLog.result(args.game)]
+        games = gameLog.gamesReaching(board)
+        print(f'Game {args.game:,} of {len(gameLog):,} ({result}), after move {moveNumber} of {len(moves)}.')
+        print(f'{len(games):,} games reached this position.')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+#! python3
+'''Faster ways to draw Four-in-a-Row boards, for replaying lots of games.
+
+fourinarow.displayBoard() looks up every space and prints the whole board
+for each frame, which is fine for one game but slow for streaming
+thousands of them to a terminal or a log file. This module has:
+
+    boardText()    the same text displayBoard() prints, with the tiles
+                   fetched in one call instead of one lookup per space.
+    DiffRenderer   draws a board once, then redraws only the spaces that
+                   changed since the last frame, moving the cursor to them
+                   with ANSI escape codes.
+    writeBoards()  writes many boards with one write() call per batch,
+                   instead of one print() per board.
+
+Usage: python fourinarowrender.py [--frames N] to compare the frames per
+second of each of these with displayBoard().'''
+
+import argparse
+import contextlib
+import functools
+import io
+import itertools
+import operator
+import random
+import sys
+import time
+
+import fourinarow
+from fourinarow import CONFIG_CACHE_SIZE, DEFAULT_CONFIG, EMPTY_SPACE, PLAYER_O, PLAYER_X, getBoardConfigOf
+
+BOARDS_PER_WRITE = 1000
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _getTiles(config):
+    '''Returns a function that returns a board's tiles as a tuple, left to
+    right and top to bottom, in one call.'''
+    spaces = [(columnIndex, rowIndex) for rowIndex in range(config.height) for columnIndex in range(config.width)]
+    if len(spaces) == 1:
+        return lambda board: (board[spaces[0]],)
+    return operator.itemgetter(*spaces)
+
+@functools.lru_cache(maxsize=CONFIG_CACHE_SIZE)
+def _getCursorMoves(config):
+    '''Returns, for each space index, the ANSI codes that move the cursor
+    from below the board to the space, and back again.'''
+    cursorMoves = []
+    for rowIndex in range(config.height):
+        # The cursor is on the line below the bottom border, in the first column:
+        linesUp = config.height - rowIndex + 1
+        for columnIndex in range(config.width):
+            cursorMoves.append((f'\x1b[{linesUp}A\x1b[{columnIndex + 2}G', f'\x1b[{linesUp}B\r'))
+    return tuple(cursorMoves)
+
+def boardTiles(board):
+    '''Returns a board's tiles as a tuple, left to right and top to bottom.'''
+    cells = getattr(board, 'cells', None) # FlatBoards already keep their tiles in this order.
+    if cells is not None:
+        return tuple(cells)
+    return _getTiles(getBoardConfigOf(board))(board)
+
+def boardText(board):
+    '''Returns the text that fourinarow.displayBoard() prints for board.'''
+    return getBoardConfigOf(board).template.format(*boardTiles(board))
+
+def writeBoards(boards, file=None, boardsPerWrite=BOARDS_PER_WRITE):
+    '''Writes the text of each board to file (standard output if None),
+    joining boardsPerWrite boards at a time into one write() call.
+    Returns the number of boards written.'''
+    file = sys.stdout if file is None else file
+    count = 0
+    batch = []
+    for board in boards:
+        batch.append(boardText(board))
+        if len(batch) == boardsPerWrite:
+            file.write('\n'.join(batch) + '\n')
+            count += len(batch)
+            batch.clear()
+    if batch:
+        file.write('\n'.join(batch) + '\n')
+        count += len(batch)
+    return count
+
+class DiffRenderer:
+    """Draws boards in place on an ANSI terminal. The first frame prints
+    the whole board; after that, draw() only moves the cursor to the
+    spaces that changed and rewrites them, and leaves the cursor back
+    below the board. Nothing else should be printed between frames, or
+    the board will be redrawn in the wrong place; call reset() first to
+    start again with a whole board under whatever was printed."""
+
+    def __init__(self, file=None):
+        self.file = sys.stdout if file is None else file
+        self.reset()
+
+    def reset(self):
+        """Makes the next frame print the whole board."""
+        self._config = None
+        self._tiles = None
+
+    def frameText(self, board):
+        """Returns the text that draws board over the last frame, and
+        remembers board as the last frame."""
+        config = getBoardConfigOf(board)
+        tiles = boardTiles(board)
+        if config != self._config:
+            self._config, self._tiles = config, tiles
+            return config.template.format(*tiles) + '\n'
+
+        cursorMoves = _getCursorMoves(config)
+        parts = []
+        for index in itertools.compress(itertools.count(), map(operator.ne, self._tiles, tiles)):
+            toSpace, back = cursorMoves[index]
+            parts.append(toSpace + tiles[index] + back)
+        self._tiles = tiles
+        return ''.join(parts)
+
+    def draw(self, board):
+        """Draws board, with one write() call."""
+        text = self.frameText(board)
+        if text:
+            self.file.write(text)
+
+def _replayFrames(frames, seed=0, config=DEFAULT_CONFIG):
+    '''Returns at least frames boards: one after each move of random games.'''
+    rng = random.Random(seed)
+    boards = []
+    while len(boards) < frames:
+        board = fourinarow.getNewBoard(config)
+        playerTile = PLAYER_X
+        boards.append(board.copy())
+        while True:
+            columnIndex = rng.choice([column for column in range(config.width) if board[(column, 0)] == EMPTY_SPACE])
+            move = fourinarow.getDropSpace(board, columnIndex)
+            board[move] = playerTile
+            boards.append(board.copy())
+            if fourinarow.isWinningMove(playerTile, board, move) or fourinarow.isFull(board):
+                break
+            playerTile = PLAYER_O if playerTile == PLAYER_X else PLAYER_X
+    return boards[:frames]
+
+def benchmark(frames=20_000):
+    '''Draws the same random games with displayBoard() and with each
+    renderer in this module, into an in-memory file. Returns a dict of
+    (framesPerSecond, charactersPerFrame) tuples by method.'''
+    boards = _replayFrames(frames)
+    results = {}
+
+    def timeIt(name, function):
+        file = io.StringIO()
+        startTime = time.perf_counter()
+        function(file)
+        results[name] = (frames / (time.perf_counter() - startTime), file.tell() / frames)
+
+    def useDisplayBoard(file):
+        with contextlib.redirect_stdout(file):
+            for board in boards:
+                fourinarow.displayBoard(board)
+
+    def useBoardText(file):
+        for board in boards:
+            file.write(boardText(board) + '\n')
+
+    def useDiffRenderer(file):
+        renderer = DiffRenderer(file)
+        for board in boards:
+            renderer.draw(board)
+
+    timeIt('displayBoard', useDisplayBoard)
+    timeIt('boardText', useBoardText)
+    timeIt('DiffRenderer', useDiffRenderer)
+    timeIt('writeBoards', lambda file: writeBoards(boards, file))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the speed of ways to draw Four-in-a-Row boards.')
+    parser.add_argument('--frames', type=int, default=20_000)
+    args = parser.parse_args()
+    results = benchmark(args.frames)
+    baseline = results['displayBoard'][0]
+    for name, (framesPerSecond, charactersPerFrame) in results.items():
+        print(f'{name:>13}: {framesPerSecond:>12,.0f} frames/sec ({framesPerSecond / baseline:.1f}x), '
+              f'{charactersPerFrame:.0f} characters/frame')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,352 @@
+#! python3
+'''An asyncio server that hosts many Four-in-a-Row games at once.
+
+Clients connect over TCP or a Unix socket and send one command per line.
+Each connection can have any number of games going, each with its own
+board and turn, identified by the number NEW replies with:
+
+    NEW [WIDTH HEIGHT CONNECT]  ->  GAME <id>
+    MOVE <id> <column>          ->  OK <column> <row> TURN <tile>    (the next player's turn)
+                                    OK <column> <row> WIN <tile>
+                                    OK <column> <row> TIE
+    BOARD <id>                  ->  BOARD <id> <tiles, left to right and top to bottom>
+    END <id>                    ->  ENDED <id>
+    STATS                       ->  STATS games=<n> moves=<n> connections=<n>
+
+Columns and rows are numbered from 1, like the labels displayBoard()
+shows, and a bad command gets an ERR <message> reply. Replies come back
+in the same order as the commands, so clients can send several commands
+without waiting. A connection's games end when it closes, and it can
+have at most MAX_GAMES_PER_CONNECTION going at once. A line longer than
+the stream's 64 KiB limit gets an ERR reply and the connection is closed.
+
+Boards can be MIN_SIZE to MAX_SIZE spaces wide and tall, with 2 to
+max(WIDTH, HEIGHT) tiles in a row to win. MOVE, END and STATS take
+constant time: a move only checks the lines through the tile just
+dropped with isWinningMove(), and a FourInARowBoard counts its empty
+spaces, so isFull() doesn't look at the board. NEW and BOARD take time
+in proportion to the number of spaces, which the size limit keeps
+small. So nothing blocks the event loop for long and one process can
+host thousands of games.
+
+The load generator plays random games against a server, many at once
+over a few pipelined connections, and reports the throughput and the
+latency of each command.
+
+Usage: python fourinarowserver.py serve [--host HOST] [--port N | --unix PATH]
+       python fourinarowserver.py load [--host HOST] [--port N | --unix PATH] [--games N] [--concurrency N]
+                                       [--connections N] [--seed N]
+       python fourinarowserver.py bench [--games N] [--concurrency N] [--connections N] [--seed N]'''
+
+import argparse
+import asyncio
+import collections
+import itertools
+import random
+import statistics
+import time
+
+import fourinarow
+from fourinarow import PLAYER_O, PLAYER_X
+
+DEFAULT_PORT = 4444
+MIN_SIZE = 4
+MAX_SIZE = 20
+MAX_GAMES_PER_CONNECTION = 256 # With MAX_SIZE, this keeps a connection's boards to a few megabytes.
+
+class Session:
+    """One game being played on the server."""
+    __slots__ = ('board', 'config', 'playerTurn', 'winner', 'over')
+
+    def __init__(self, config):
+        self.config = config
+        self.board = fourinarow.getNewBoard(config)
+        self.playerTurn = PLAYER_X
+        self.winner = None
+        self.over = False
+
+    def move(self, columnIndex):
+        """Drops the current player's tile into columnIndex. Returns the
+        (columnIndex, rowIndex) it lands in, or raises ValueError."""
+        if self.over:
+            raise ValueError('the game is over')
+        if not 0 <= columnIndex < self.config.width:
+            raise ValueError(f'there is no column {columnIndex + 1}')
+        move = fourinarow.getDropSpace(self.board, columnIndex)
+        if move is None:
+            raise ValueError(f'column {columnIndex + 1} is full')
+        self.board[move] = self.playerTurn
+        if fourinarow.isWinningMove(self.playerTurn, self.board, move):
+            self.winner, self.over = self.playerTurn, True
+        elif fourinarow.isFull(self.board):
+            self.over = True
+        else:
+            self.playerTurn = PLAYER_O if self.playerTurn == PLAYER_X else PLAYER_X
+        return move
+
+def _getSessionConfig(sizeWords):
+    '''Returns the BoardConfig for NEW's WIDTH HEIGHT CONNECT words, or
+    raises ValueError if the board is outside the server's limits.'''
+    if len(sizeWords) != 3:
+        raise ValueError('NEW takes a WIDTH, HEIGHT and CONNECT, or nothing')
+    width, height, connect = map(int, sizeWords)
+    if not (MIN_SIZE <= width <= MAX_SIZE and MIN_SIZE <= height <= MAX_SIZE):
+        raise ValueError(f'boards must be {MIN_SIZE} to {MAX_SIZE} spaces wide and tall')
+    if not 2 <= connect <= max(width, height):
+        raise ValueError(f'CONNECT must be 2 to {max(width, height)} on a {width}x{height} board')
+    return fourinarow.getBoardConfig(width, height, connect)
+
+class GameServer:
+    def __init__(self):
+        self._gameIds = itertools.count(1)
+        self.games = 0 # The number of games going, on every connection.
+        self.moves = 0
+        self.connections = 0
+
+    async def handleConnection(self, reader, writer):
+        """Runs the commands from one connection until it closes."""
+        self.connections += 1
+        sessions = {}
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError: # The line is longer than the reader's limit.
+                    writer.write(b'ERR line too long\n')
+                    break
+                if not line:
+                    break
+                writer.write(self.runCommand(line, sessions).encode() + b'\n')
+                if writer.transport.get_write_buffer_size() > 1 << 16:
+                    await writer.drain() # Slow down if the client isn't reading its replies.
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self.games -= len(sessions)
+            self.connections -= 1
+            writer.close()
+
+    def runCommand(self, line, sessions):
+        """Returns the reply to one command line."""
+        words = line.decode('ascii', 'replace').split()
+        if not words:
+            return 'ERR empty command'
+        command = words[0].upper()
+        try:
+            if command == 'NEW':
+                if len(sessions) >= MAX_GAMES_PER_CONNECTION:
+                    return f'ERR a connection can only have {MAX_GAMES_PER_CONNECTION} games at once'
+                config = _getSessionConfig(words[1:4]) if len(words) > 1 else fourinarow.DEFAULT_CONFIG
+                gameId = next(self._gameIds)
+                sessions[gameId] = Session(config)
+                self.games += 1
+                return f'GAME {gameId}'
+            if command == 'STATS':
+                return f'STATS games={self.games} moves={self.moves} connections={self.connections}'
+            if command not in ('MOVE', 'BOARD', 'END'):
+                return f'ERR unknown command {command}'
+            session = sessions.get(int(words[1]))
+            if session is None:
+                return f'ERR no game {words[1]} on this connection'
+            if command == 'MOVE':
+                columnIndex, rowIndex = session.move(int(words[2]) - 1)
+                self.moves += 1
+                if session.winner is not None:
+                    status = f'WIN {session.winner}'
+                elif session.over:
+                    status = 'TIE'
+                else:
+                    status = f'TURN {session.playerTurn}'
+                return f'OK {columnIndex + 1} {rowIndex + 1} {status}'
+            if command == 'BOARD':
+                config = session.config
+                tiles = ''.join(session.board[(columnIndex, rowIndex)]
+                                for rowIndex in range(config.height) for columnIndex in range(config.width))
+                return f'BOARD {words[1]} {tiles}'
+            if command == 'END':
+                del sessions[int(words[1])]
+                self.games -= 1
+                return f'ENDED {words[1]}'
+        except IndexError:
+            return f'ERR missing arguments for {command}'
+        except ValueError as error:
+            return f'ERR {error}'
+
+async def serve(host='127.0.0.1', port=DEFAULT_PORT, unixPath=None):
+    """Starts a GameServer on a TCP port, or a Unix socket if unixPath is
+    given. Returns (GameServer, asyncio.Server)."""
+    gameServer = GameServer()
+    if unixPath is not None:
+        server = await asyncio.start_unix_server(gameServer.handleConnection, unixPath)
+    else:
+        server = await asyncio.start_server(gameServer.handleConnection, host, port)
+    return gameServer, server
+
+class Connection:
+    """A client connection that can have many commands waiting for
+    replies at once. The server replies in order, so each reply goes to
+    the oldest command still waiting."""
+
+    def __init__(self, reader, writer):
+        self._reader = reader
+        self._writer = writer
+        self._waiting = collections.deque()
+        self._readTask = asyncio.ensure_future(self._readReplies())
+
+    @classmethod
+    async def open(cls, host='127.0.0.1', port=DEFAULT_PORT, unixPath=None):
+        if unixPath is not None:
+            reader, writer = await asyncio.open_unix_connection(unixPath)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _readReplies(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                self._waiting.popleft().set_result(line.decode().rstrip('\n'))
+        except ConnectionError: # E.g. reset by the server; fail the waiting commands below.
+            pass
+        finally:
+            # However reading stopped, don't leave any command waiting forever:
+            while self._waiting:
+                reply = self._waiting.popleft()
+                if not reply.done():
+                    reply.set_exception(ConnectionError('the server closed the connection'))
+
+    async def command(self, line):
+        """Sends a command and returns its reply."""
+        if self._readTask.done():
+            raise ConnectionError('the server closed the connection')
+        reply = asyncio.get_running_loop().create_future()
+        self._waiting.append(reply)
+        self._writer.write(line.encode() + b'\n')
+        return await reply
+
+    async def close(self):
+        self._writer.close()
+        await self._writer.wait_closed()
+        self._readTask.cancel()
+
+async def _playRandomGame(connection, rng, latencies):
+    '''Plays one game of random moves. Returns the number of commands sent.'''
+    async def timedCommand(line):
+        startTime = time.perf_counter()
+        reply = await connection.command(line)
+        latencies.append(time.perf_counter() - startTime)
+        if reply.startswith('ERR'):
+            raise RuntimeError(f'{line!r} got {reply!r}')
+        return reply
+
+    gameId = (await timedCommand('NEW')).split()[1]
+    config = fourinarow.DEFAULT_CONFIG
+    heights = [0] * config.width
+    commands = 1
+    while True:
+        columnIndex = rng.choice([column for column in range(config.width) if heights[column] < config.height])
+        reply = await timedCommand(f'MOVE {gameId} {columnIndex + 1}')
+        heights[columnIndex] += 1
+        commands += 1
+        if ' TURN ' not in reply:
+            break
+    await timedCommand(f'END {gameId}')
+    return commands + 1
+
+async def loadTest(games=10_000, concurrency=1000, connections=16, host='127.0.0.1', port=DEFAULT_PORT,
+                   unixPath=None, seed=0):
+    """Plays games random games against a server, with up to concurrency
+    games going at once over connections connections. Returns a report dict."""
+    if concurrency > connections * MAX_GAMES_PER_CONNECTION:
+        raise ValueError(f'the server allows {MAX_GAMES_PER_CONNECTION} games per connection, so '
+                         f'{concurrency} games at once need at least '
+                         f'{-(-concurrency // MAX_GAMES_PER_CONNECTION)} connections')
+    clients = [await Connection.open(host, port, unixPath) for i in range(connections)]
+    gameNumbers = iter(range(games))
+    latencies = []
+    commands = 0
+
+    async def worker(workerNumber):
+        nonlocal commands
+        connection = clients[workerNumber % connections]
+        for gameNumber in gameNumbers: # Shared, so each game is played once.
+            gameCommands = await _playRandomGame(connection, random.Random(f'{seed}:{gameNumber}'), latencies)
+            commands += gameCommands
+
+    startTime = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker(workerNumber) for workerNumber in range(concurrency)))
+    finally:
+        for client in clients:
+            await client.close()
+    seconds = time.perf_counter() - startTime
+
+    latencies.sort()
+    def percentile(fraction):
+        return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] if latencies else 0.0
+    return {
+        'games': games,
+        'concurrency': concurrency,
+        'connections': connections,
+        'commands': commands,
+        'seconds': seconds,
+        'gamesPerSecond': games / seconds if seconds else 0.0,
+        'commandsPerSecond': commands / seconds if seconds else 0.0,
+        'latencyMean': statistics.fmean(latencies) if latencies else 0.0,
+        'latencyP50': percentile(0.50),
+        'latencyP90': percentile(0.90),
+        'latencyP99': percentile(0.99),
+        'latencyMax': latencies[-1] if latencies else 0.0,
+    }
+
+def formatReport(report):
+    '''Returns a report from loadTest() as readable text.'''
+    milliseconds = lambda name: f'{report[name] * 1000:.2f} ms'
+    return '\n'.join((
+        f"{report['games']:,} games, {report['commands']:,} commands, {report['concurrency']:,} games at once "
+        f"over {report['connections']} connections, in {report['seconds']:.2f} seconds",
+        f"  {report['gamesPerSecond']:,.0f} games/sec, {report['commandsPerSecond']:,.0f} commands/sec",
+        f"  latency: mean {milliseconds('latencyMean')}, p50 {milliseconds('latencyP50')}, "
+        f"p90 {milliseconds('latencyP90')}, p99 {milliseconds('latencyP99')}, max {milliseconds('latencyMax')}",
+    ))
+
+async def _serveForever(args):
+    gameServer, server = await serve(args.host, args.port, args.unix)
+    print(f'Serving Four-in-a-Row on {args.unix or f"{args.host}:{args.port}"}')
+    async with server:
+        await server.serve_forever()
+
+async def _bench(args):
+    '''Runs a server and the load generator in the same event loop.'''
+    gameServer, server = await serve(args.host, 0, None)
+    port = server.sockets[0].getsockname()[1]
+    async with server:
+        return await loadTest(args.games, args.concurrency, args.connections, args.host, port, seed=args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description='Host Four-in-a-Row games, or load test a server that does.')
+    parser.add_argument('mode', choices=('serve', 'load', 'bench'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--unix', metavar='PATH', help='use a Unix socket instead of TCP')
+    parser.add_argument('--games', type=int, default=10_000, help='games the load generator plays')
+    parser.add_argument('--concurrency', type=int, default=1000, help='games the load generator plays at once')
+    parser.add_argument('--connections', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.mode == 'serve':
+        try:
+            asyncio.run(_serveForever(args))
+        except KeyboardInterrupt:
+            pass
+    elif args.mode == 'load':
+        print(formatReport(asyncio.run(loadTest(args.games, args.concurrency, args.connections,
+                                                args.host, args.port, args.unix, args.seed))))
+    else:
+        print(formatReport(asyncio.run(_bench(args))))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,205 @@
+#! python3
+'''Plays Four-in-a-Row games without a screen or keyboard, for measuring
+how fast the engine is.
+
+playGame() runs one game between two move policies. A policy is any
+function, or other callable, that takes (playerTile, board, rng) and
+returns the columnIndex to drop a tile into; rng is the game's
+random.Random. runGames() plays many games, split across a pool of
+processes, and returns a report of the wins, ties and games per second.
+
+Every game gets its own seed made from the run's seed and the game's
+number, so a run gives the same results no matter how many processes
+play it.
+
+With a record path, every game is also appended to a fourinarowrecord
+game log, in game number order.
+
+Usage: python fourinarowsim.py [--games N] [--processes N] [--seed N] [--x POLICY] [--o POLICY] [--opening N]
+       [--width N] [--height N] [--connect N] [--record LOG]'''
+
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import time
+
+import fourinarow
+import fourinarowrecord
+
+def randomPolicy(playerTile, board, rng):
+    '''Drops the tile into a random column that isn't full.'''
+    return rng.choice([columnIndex for columnIndex in range(fourinarow.getBoardConfigOf(board).width)
+                       if board[(columnIndex, 0)] == fourinarow.EMPTY_SPACE])
+
+class AIPolicy:
+    '''Lets a fourinarowai.AIPlayer choose the moves. Searching to a fixed
+    depth, instead of for a fixed time, keeps the games reproducible.'''
+    def __init__(self, maxDepth=4, timeLimit=None, tableSize=1 << 16):
+        self.maxDepth = maxDepth
+        self.timeLimit = timeLimit
+        self.tableSize = tableSize
+        self._player = None
+        self._gameRng = None
+
+    def __call__(self, playerTile, board, rng):
+        if rng is not self._gameRng:
+            # A new game: start with an empty transposition table, so moves
+            # don't depend on which games this process happened to play before.
+            import fourinarowai
+            self._player = fourinarowai.AIPlayer(self.timeLimit, self.maxDepth, self.tableSize)
+            self._gameRng = rng
+        return self._player.chooseMove(playerTile, board)
+
+    def __getstate__(self):
+        return {'maxDepth': self.maxDepth, 'timeLimit': self.timeLimit,
+                'tableSize': self.tableSize, '_player': None, '_gameRng': None}
+
+    def __repr__(self):
+        return f'AIPolicy(maxDepth={self.maxDepth}, timeLimit={self.timeLimit})'
+
+def playGame(policyX, policyO, rng, openingMoves=0, config=fourinarow.DEFAULT_CONFIG, moves=None):
+    '''Plays one game on a board of the given BoardConfig. The first
+    openingMoves moves are random, which makes games between two
+    deterministic policies differ from each other. If moves is a list,
+    the column of each move is appended to it. Returns (winner,
+    moveCount), where winner is "X", "O", or None for a tie.'''
+    board = fourinarow.getNewBoard(config)
+    playerTurn, policy = fourinarow.PLAYER_X, policyX
+    moveCount = 0
+    while True:
+        if moveCount < openingMoves:
+            move = fourinarow.getDropSpace(board, randomPolicy(playerTurn, board, rng))
+        else:
+            move = fourinarow.getDropSpace(board, policy(playerTurn, board, rng))
+        board[move] = playerTurn
+        moveCount += 1
+        if moves is not None:
+            moves.append(move[0])
+        if fourinarow.isWinningMove(playerTurn, board, move):
+            return playerTurn, moveCount
+        if fourinarow.isFull(board):
+            return None, moveCount
+        if playerTurn == fourinarow.PLAYER_X:
+            playerTurn, policy = fourinarow.PLAYER_O, policyO
+        else:
+            playerTurn, policy = fourinarow.PLAYER_X, policyX
+
+def gameRng(seed, gameNumber):
+    '''Returns the random.Random for one game of a run.'''
+    return random.Random(f'{seed}:{gameNumber}')
+
+def _playShard(args):
+    '''Plays games firstGame up to lastGame. Returns (xWins, oWins, ties,
+    moves, records), where records is a list of fourinarowrecord game
+    records if record is true, or else empty.'''
+    policyX, policyO, seed, openingMoves, config, record, firstGame, lastGame = args
+    results = {fourinarow.PLAYER_X: 0, fourinarow.PLAYER_O: 0, None: 0}
+    totalMoves = 0
+    records = []
+    for gameNumber in range(firstGame, lastGame):
+        moves = [] if record else None
+        winner, moveCount = playGame(policyX, policyO, gameRng(seed, gameNumber), openingMoves, config, moves)
+        results[winner] += 1
+        totalMoves += moveCount
+        if record:
+            records.append(fourinarowrecord.encodeGame(moves, fourinarowrecord.RESULTS[winner]))
+    return results[fourinarow.PLAYER_X], results[fourinarow.PLAYER_O], results[None], totalMoves, records
+
+def runGames(numGames, policyX=randomPolicy, policyO=randomPolicy, seed=0, processes=None,
+             openingMoves=0, config=fourinarow.DEFAULT_CONFIG, shardSize=1000, recordPath=None):
+    '''Plays numGames games across a pool of processes (one per CPU if
+    processes is None), and returns a report dict. If recordPath is given,
+    the games are appended to the game log there.'''
+    processes = processes or os.cpu_count()
+    record = recordPath is not None
+    shards = [(policyX, policyO, seed, openingMoves, config, record, first, min(first + shardSize, numGames))
+              for first in range(0, numGames, shardSize)]
+    recorder = fourinarowrecord.GameRecorder(recordPath, config) if record else None
+    startTime = time.perf_counter()
+    try:
+        if processes == 1:
+            shardResults = map(_playShard, shards)
+            xWins, oWins, ties, totalMoves = _addShards(shardResults, recorder)
+        else:
+            with multiprocessing.Pool(processes) as pool:
+                # imap() hands back the shards in order, so the log is in game number order:
+                xWins, oWins, ties, totalMoves = _addShards(pool.imap(_playShard, shards), recorder)
+    finally:
+        if recorder is not None:
+            recorder.close()
+    seconds = time.perf_counter() - startTime
+
+    return {
+        'games': numGames,
+        'seed': seed,
+        'openingMoves': openingMoves,
+        'board': f'{config.width}x{config.height}, {config.connect} in a row',
+        'policyX': _policyName(policyX),
+        'policyO': _policyName(policyO),
+        'processes': processes,
+        'xWins': xWins,
+        'oWins': oWins,
+        'ties': ties,
+        'averageMoves': totalMoves / numGames if numGames else 0.0,
+        'seconds': seconds,
+        'gamesPerSecond': numGames / seconds if seconds else 0.0,
+        'movesPerSecond': totalMoves / seconds if seconds else 0.0,
+    }
+
+def _addShards(shardResults, recorder):
+    '''Adds up the results of _playShard(), writing any records to
+    recorder as they come in. Returns (xWins, oWins, ties, moves).'''
+    totals = [0, 0, 0, 0]
+    for *counts, records in shardResults:
+        for index, count in enumerate(counts):
+            totals[index] += count
+        if recorder is not None:
+            recorder.recordMany(records)
+    return tuple(totals)
+
+def _policyName(policy):
+    return getattr(policy, '__name__', None) or repr(policy)
+
+def formatReport(report):
+    '''Returns a report from runGames() as readable text.'''
+    games = report['games'] or 1
+    return '\n'.join((
+        f"{report['games']:,} games of {report['policyX']} (X) vs {report['policyO']} (O) "
+        f"on a {report['board']} board, "
+        f"seed {report['seed']}, {report['openingMoves']} random opening moves, {report['processes']} processes",
+        f"  X wins: {report['xWins']:>10,} ({report['xWins'] / games:.1%})",
+        f"  O wins: {report['oWins']:>10,} ({report['oWins'] / games:.1%})",
+        f"  Ties:   {report['ties']:>10,} ({report['ties'] / games:.1%})",
+        f"  Average moves per game: {report['averageMoves']:.1f}",
+        f"  {report['gamesPerSecond']:,.0f} games/sec, {report['movesPerSecond']:,.0f} moves/sec "
+        f"({report['seconds']:.2f} seconds)",
+    ))
+
+def main():
+    parser = argparse.ArgumentParser(description='Play Four-in-a-Row games headless and report the results.')
+    parser.add_argument('--games', type=int, default=10_000)
+    parser.add_argument('--processes', type=int, default=None, help='default: one per CPU')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--x', choices=('random', 'ai'), default='random', help='policy for player X')
+    parser.add_argument('--o', choices=('random', 'ai'), default='random', help='policy for player O')
+    parser.add_argument('--depth', type=int, default=4, help='search depth of the ai policy')
+    parser.add_argument('--opening', type=int, default=0, help='number of random moves to start each game with')
+    parser.add_argument('--width', type=int, default=fourinarow.BOARD_WIDTH)
+    parser.add_argument('--height', type=int, default=fourinarow.BOARD_HEIGHT)
+    parser.add_argument('--connect', type=int, default=4, help='number of tiles in a row that wins')
+    parser.add_argument('--json', metavar='FILE', help='also write the report to FILE as JSON')
+    parser.add_argument('--record', metavar='LOG', help='append every game to the game log LOG')
+    args = parser.parse_args()
+
+    policies = {'random': randomPolicy, 'ai': AIPolicy(args.depth)}
+    report = runGames(args.games, policies[args.x], policies[args.o], args.seed, args.processes, args.opening,
+                      fourinarow.getBoardConfig(args.width, args.height, args.connect), recordPath=args.record)
+    print(formatReport(report))
+    if args.json:
+        with open(args.json, 'w') as jsonFile:
+            json.dump(report, jsonFile, indent=2)
+
+if __name__ == '__main__':
+    main()
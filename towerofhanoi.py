@@ -5,10 +5,90 @@ import copy
 import sys
 
 TOTAL_DISKS = 5 # More disks means a more difficult puzle
+TOTAL_TOWERS = 3 # From 3 up to 8. More towers makes the puzzle easier.
 
 # Start with all the disks in tower A:
 SOLVED_TOWER = list(range(TOTAL_DISKS,0, -1)) # range(start, stop, step)
 
+ALL_TOWER_NAMES = "ABCDEFGH"
+TOWER_NAMES = tuple(ALL_TOWER_NAMES[:TOTAL_TOWERS]) # ("A", "B", "C") for three towers.
+TOWER_INDEXES = {name: index for index, name in enumerate(ALL_TOWER_NAMES)}
+# Every "from" and "to" pair of towers, like "AB" and "CA":
+VALID_MOVES = tuple(fromTower + toTower for fromTower in TOWER_NAMES for toTower in TOWER_NAMES
+                    if fromTower != toTower)
+
+class CompactTowers:
+    """The towers as one byte per disk, giving the index of the tower the
+    disk is on, plus one int per tower with bit (disk - 1) set for each
+    disk on it. The top disk of a tower is its smallest, the lowest set
+    bit, so finding it, checking a move and checking for a win don't
+    depend on how many disks there are. toDict() and fromDict() convert
+    to and from the towers dictionary that displayTowers() uses."""
+
+    __slots__ = ("totalDisks", "totalTowers", "diskTowers", "towerBits")
+
+    def __init__(self, totalDisks=TOTAL_DISKS, totalTowers=TOTAL_TOWERS):
+        """Create the starting towers, with every disk on tower A."""
+        self.totalDisks = totalDisks
+        self.totalTowers = totalTowers
+        self.diskTowers = bytearray(totalDisks) # diskTowers[disk - 1] is the disk's tower index.
+        self.towerBits = [(1 << totalDisks) - 1] + [0] * (totalTowers - 1)
+
+    @classmethod
+    def fromDict(cls, towers):
+        """Create a CompactTowers from a towers dictionary. Raises
+        ValueError if it isn't a legal configuration."""
+        disks = sorted(disk for tower in towers.values() for disk in tower)
+        if disks != list(range(1, len(disks) + 1)):
+            raise ValueError("the towers must have disks 1 to n, once each")
+        if sorted(towers) != list(ALL_TOWER_NAMES[:len(towers)]):
+            # Tower i is stored at index i, so the names can't skip a letter:
+            raise ValueError(f"the towers must be named {', '.join(ALL_TOWER_NAMES[:len(towers)])}")
+        compactTowers = cls(len(disks), len(towers))
+        compactTowers.towerBits = [0] * len(towers)
+        for name, tower in towers.items():
+            if tower != sorted(tower, reverse=True):
+                raise ValueError(f"tower {name} has a larger disk on top of a smaller one")
+            towerIndex = TOWER_INDEXES[name]
+            for disk in tower:
+                compactTowers.diskTowers[disk - 1] = towerIndex
+                compactTowers.towerBits[towerIndex] |= 1 << (disk - 1)
+        return compactTowers
+
+    def toDict(self):
+        """Returns the towers dictionary, with each list bottom disk first."""
+        towers = {name: [] for name in ALL_TOWER_NAMES[:self.totalTowers]}
+        for disk in range(self.totalDisks, 0, -1):
+            towers[ALL_TOWER_NAMES[self.diskTowers[disk - 1]]].append(disk)
+        return towers
+
+    def topDisk(self, tower):
+        """Returns the disk on top of a tower ("A", "B" or "C"), or 0 if
+        it has no disks."""
+        bits = self.towerBits[TOWER_INDEXES[tower]]
+        return (bits & -bits).bit_length()
+
+    def canMove(self, fromTower, toTower):
+        """Returns True if the top disk of fromTower can go on toTower."""
+        fromBits = self.towerBits[TOWER_INDEXES[fromTower]]
+        toBits = self.towerBits[TOWER_INDEXES[toTower]]
+        # The lowest bit of fromBits must be lower than the lowest of toBits:
+        return fromBits != 0 and (toBits == 0 or (fromBits & -fromBits) < (toBits & -toBits))
+
+    def move(self, fromTower, toTower):
+        """Moves the top disk of fromTower to toTower. Returns the disk."""
+        fromIndex, toIndex = TOWER_INDEXES[fromTower], TOWER_INDEXES[toTower]
+        bit = self.towerBits[fromIndex] & -self.towerBits[fromIndex]
+        self.towerBits[fromIndex] ^= bit
+        self.towerBits[toIndex] |= bit
+        disk = bit.bit_length()
+        self.diskTowers[disk - 1] = toIndex
+        return disk
+
+    def isSolved(self):
+        """Returns True if every disk is on one tower other than A."""
+        return (1 << self.totalDisks) - 1 in self.towerBits[1:]
+
 def main():
     '''Runs a single game of The Tower of Hanoi.'''
     print(
@@ -29,30 +109,36 @@ list [] represents a tower of no disks. The list [1, 3] has a
 larger disk on top of a smaller disk and is an invalid
 configuration. The list [3, 1] is allowed since smaller disks
 can go on top of larger ones."""
-    towers = {"A":copy.copy(SOLVED_TOWER), "B":[], "C":[]}
+    towers = {name: [] for name in TOWER_NAMES}
+    towers["A"] = copy.copy(SOLVED_TOWER)
+    towers = CompactTowers.fromDict(towers)
+    # The game keeps the towers as a CompactTowers, see above, and
+    # converts them to the dictionary form to display them.
 
     while True: # Run a single turn on each iteration of this loop.
         # Display the towers and disks:
-        displayTowers(towers)
+        displayTowers(towers.toDict())
 
         # Ask the user for a move:
         fromTower, toTower = getPlayerMove(towers)
 
         # Move the top disk from fromTower to toTOwer:
-        disk = towers[fromTower].pop()
-        towers[toTower].append(disk)
+        towers.move(fromTower, toTower)
 
         # Check if the user has solved the puzzle
-        if SOLVED_TOWER in (towers["B"], towers["C"]):
-            displayTowers(towers) # Display the towers on last time
+        if towers.isSolved():
+            displayTowers(towers.toDict()) # Display the towers on last time
             print("You have solved the upzzle! Well done!")
             sys.exit()
 
 def getPlayerMove(towers):
-    '''Asks the player for a move.  Returns (fromTower, toTower).'''
+    '''Asks the player for a move.  Returns (fromTower, toTower). towers
+    is a CompactTowers or a towers dictionary.'''
+    if isinstance(towers, dict):
+        towers = CompactTowers.fromDict(towers)
 
     while True: # Keep asking player until the enter a valid move
-        print('Enter the letter of "from" and "to" towers, or QUIT.')
+        print('Enter the letter of "from" and "to" towers, HINT, or QUIT.')
         print("(e.g., AB to move a disk from tower A to tower B.)")
         print()
         response = input("> ").upper().strip()
@@ -61,22 +147,31 @@ def getPlayerMove(towers):
             print("Thanks for playing!")
             sys.exit()
 
+        if response == "HINT":
+            if towers.totalTowers != 3:
+                print("Hints only work with three towers.")
+                continue # Ask player again for their move
+            import towerofhanoisolver # Only needed for hints.
+            fromTower, toTower, moveCount = towerofhanoisolver.hintFor(towers)
+            print(f"Try {fromTower}{toTower}. You can finish in {moveCount} moves.")
+            continue # Ask player again for their move
+
         # Make sure the user entered valid towqer letters:
-        if response not in ("AB", "AC", "BA", "BC", "CA", "CB"):
-            print("Enter one of AB, AC, BA, BC, CA or CB.")
+        if response not in VALID_MOVES:
+            print("Enter one of " + ", ".join(VALID_MOVES[:-1]) + " or " + VALID_MOVES[-1] + ".")
             continue # As player again for their move
 
         # Use more descriptive variable names:
         fromTower, toTower = response[0], response[1]
 
-        if len(towers[fromTower]) == 0:
+        if towers.topDisk(fromTower) == 0:
             # The "from" Tower cannot be an empty tower:
             print("You selected a tower with no disks.")
             continue # Ask player again for their move
-        elif len(towers[toTower]) == 0:
+        elif towers.topDisk(toTower) == 0:
             # Any disk can be moved into an empty "to" tower:
             return fromTower, toTower
-        elif towers[toTower][-1] < towers[fromTower][-1]:
+        elif not towers.canMove(fromTower, toTower):
             print("Can't put larger disks on top of smaller ones.")
             continue # Ask player sgain for their move:
         else:
@@ -89,18 +184,18 @@ single tuple of two values, which is equivalent to return (fromTower, toTower).
             return fromTower, toTower
 
 def displayTowers(towers):
-    '''Display the three towers with their disks.'''
+    '''Display the towers with their disks.'''
 
-    # Display the three towers:
+    # Display the towers, A first:
     for level in range(TOTAL_DISKS, -1, -1): # range(start, stop, step)
-        for tower in (towers["A"], towers["B"], towers["C"]):
+        for tower in (towers[name] for name in sorted(towers)):
             if level >= len(tower):
                 displayDisk(0) # Display the bare pole with no disk.
             else:
                 displayDisk(tower[level]) # Display the disk
         print()
 
-    # Display the tower labels A, B and C:
+    # Display the tower labels, A, B and C for three towers:
     emptySpace = " " * (TOTAL_DISKS)
     '''
     In the line of code below, the format() string method puts whatever is in between
@@ -113,7 +208,8 @@ def displayTowers(towers):
     eggs and spam
 
     '''
-    print("{0} A{0}{0} B{0}{0} C\n".format(emptySpace))
+    labels = "{0}" + "{0}{0}".join(" " + name for name in sorted(towers)) + "\n" # "{0} A{0}{0} B{0}{0} C\n" for three towers.
+    print(labels.format(emptySpace))
     '''
     This is what prints when you run the game:
 
@@ -0,0 +1,465 @@
+"""TOWER OF HANOI SOLVER
+Generates the optimal solution of The Tower of Hanoi for any number of
+disks, without recursion and without keeping the moves in a list.
+
+The solution for n disks takes 2**n - 1 moves, which is billions of moves
+for 30 or more disks, so the moves are worked out from the move number.
+Number the pegs 0, 1 and 2, with the disks starting on peg 0. Then move
+number k (counting from 1) takes the top disk of peg (k & (k - 1)) % 3 and
+puts it on peg ((k | (k - 1)) + 1) % 3, and the disk it moves is one
+more than the number of 0 bits at the low end of k. With an odd number
+of disks this moves the tower to peg 2, and with an even number to peg 1,
+so the pegs are given letters to match.
+
+iterMoves() yields the moves one at a time, moveAt() works out any one
+move directly, and iterMoveChunks() yields the moves in big packed
+chunks, for when the moves are needed as fast as possible. towersAfter()
+works out where every disk is after any number of moves, and
+verifyMoves() checks a solution in parallel, each process replaying one
+range of moves from the towers that towersAfter() gives for its start.
+
+solveFrom() and hintFor() find the fewest moves that finish a game from
+any legal position, not just the start.
+
+With more than three pegs, frameStewartMoves() yields the moves of the
+Frame-Stewart solution: move the smallest t disks aside using every peg,
+move the other disks to the target with one peg fewer, then move the t
+disks on top of them. frameStewartCount() gives its number of moves, from
+a table that picks the best t for each number of disks and pegs, and is
+kept for later calls.
+
+Usage: python towerofhanoisolver.py DISKS [--chunks] [--limit N] [--verify] [--processes N] [--hints N]
+       python towerofhanoisolver.py DISKS --pegs K [--limit N]
+       python towerofhanoisolver.py MAX_DISKS --frame-stewart"""
+
+import argparse
+import concurrent.futures
+import functools
+import os
+import random
+import statistics
+import time
+
+PEGS = ("A", "B", "C")
+ALL_PEG_NAMES = "ABCDEFGH" # For frameStewartMoves() with up to 8 pegs, like towerofhanoi.ALL_TOWER_NAMES.
+CHUNK_DISKS = 16 # iterMoveChunks() yields 2 ** CHUNK_DISKS moves at a time.
+
+def solutionLength(totalDisks):
+    """Returns the number of moves in the optimal solution."""
+    return (1 << totalDisks) - 1
+
+def _pegLetters(totalDisks, source, target, spare):
+    """Returns the letters of pegs 0, 1 and 2 of the bit formula."""
+    if totalDisks % 2 == 1:
+        return (source, spare, target)
+    return (source, target, spare)
+
+def moveAt(moveNumber, totalDisks, source="A", target="C", spare="B"):
+    """Returns (fromTower, toTower) for move number moveNumber (counting
+    from 1) of the optimal solution, in time proportional to the number
+    of disks."""
+    if not 1 <= moveNumber <= solutionLength(totalDisks):
+        raise ValueError(f"a {totalDisks}-disk solution has no move {moveNumber}")
+    pegs = _pegLetters(totalDisks, source, target, spare)
+    return pegs[(moveNumber & (moveNumber - 1)) % 3], pegs[((moveNumber | (moveNumber - 1)) + 1) % 3]
+
+def diskAt(moveNumber):
+    """Returns the disk (1 is the smallest) that move number moveNumber moves."""
+    return (moveNumber & -moveNumber).bit_length()
+
+def iterMoves(totalDisks, source="A", target="C", spare="B", start=1, stop=None):
+    """Yields (fromTower, toTower) for moves start up to, but not
+    including, stop (the end of the solution if None) of the optimal
+    solution."""
+    pegs = _pegLetters(totalDisks, source, target, spare)
+    stop = solutionLength(totalDisks) + 1 if stop is None else stop
+    for moveNumber in range(start, stop):
+        yield pegs[(moveNumber & (moveNumber - 1)) % 3], pegs[((moveNumber | (moveNumber - 1)) + 1) % 3]
+
+def towersAfter(moveCount, totalDisks, source="A", target="C", spare="B"):
+    """Returns the towers dictionary, like the one towerofhanoi.main()
+    uses, after the first moveCount moves of the optimal solution. Works
+    in time proportional to the number of disks, from the bits of
+    moveCount."""
+    if not 0 <= moveCount <= solutionLength(totalDisks):
+        raise ValueError(f"a {totalDisks}-disk solution has no move {moveCount}")
+    towers = {source: [], target: [], spare: []}
+    # Going from the largest disk down: moving disks 1 to d from fromPeg to
+    # toPeg takes 2 ** (d - 1) - 1 moves with disks 1 to d - 1, one move
+    # of disk d, and then 2 ** (d - 1) - 1 more. So bit d - 1 of the move
+    # count says whether disk d has moved yet, and where the smaller
+    # disks are headed:
+    fromPeg, toPeg, otherPeg = source, target, spare
+    for disk, bit in zip(range(totalDisks, 0, -1), format(moveCount, f"0{totalDisks}b")):
+        if bit == "0":
+            towers[fromPeg].append(disk)
+            toPeg, otherPeg = otherPeg, toPeg
+        else:
+            towers[toPeg].append(disk)
+            fromPeg, otherPeg = otherPeg, fromPeg
+    return towers
+
+# A move is packed into one byte as fromPeg * 3 + toPeg, with the pegs
+# numbered by their position in PEGS:
+def packMove(fromTower, toTower):
+    return PEGS.index(fromTower) * 3 + PEGS.index(toTower)
+
+def unpackMove(code):
+    """Returns (fromTower, toTower) for a packed move."""
+    return PEGS[code // 3], PEGS[code % 3]
+
+@functools.lru_cache(maxsize=None)
+def _chunkTemplate(chunkDisks):
+    """Returns the packed moves for moving chunkDisks disks from peg A to
+    peg B, and the bytes.translate() tables that relabel them for every
+    other pair of pegs, keyed by (fromPeg, toPeg) numbers."""
+    template = bytes(packMove(fromTower, toTower) for fromTower, toTower in iterMoves(chunkDisks, "A", "B", "C"))
+    tables = {}
+    for fromPeg in range(3):
+        for toPeg in range(3):
+            if fromPeg != toPeg:
+                relabel = (fromPeg, toPeg, 3 - fromPeg - toPeg) # Where pegs A, B and C go.
+                table = bytearray(range(256))
+                for code in range(9):
+                    table[code] = relabel[code // 3] * 3 + relabel[code % 3]
+                tables[(fromPeg, toPeg)] = bytes(table)
+    return template, tables
+
+def iterMoveChunks(totalDisks, source="A", target="C", spare="B", chunkDisks=CHUNK_DISKS):
+    """Yields the optimal solution as bytes objects of packed moves (see
+    packMove()), 2 ** chunkDisks moves in each but the last.
+
+    Every 2 ** chunkDisks moves, the smallest chunkDisks disks are all on
+    one peg, and the moves until they are all on one peg again are the
+    solution for chunkDisks disks with the pegs relabeled. So each chunk
+    is one solution, worked out once, relabeled with bytes.translate(),
+    plus the move of a larger disk that comes after it."""
+    if totalDisks <= chunkDisks:
+        yield bytes(packMove(fromTower, toTower) for fromTower, toTower in iterMoves(totalDisks, source, target, spare))
+        return
+    template, tables = _chunkTemplate(chunkDisks)
+    chunkSize = 1 << chunkDisks
+    for chunkNumber in range(1 << (totalDisks - chunkDisks)):
+        firstMove = chunkNumber * chunkSize + 1
+        # The first move of a chunk takes disk 1 off the small tower, and
+        # the last one puts it on top of the small tower at its new peg:
+        fromPeg = PEGS.index(moveAt(firstMove, totalDisks, source, target, spare)[0])
+        toPeg = PEGS.index(moveAt(firstMove + chunkSize - 2, totalDisks, source, target, spare)[1])
+        chunk = template.translate(tables[(fromPeg, toPeg)])
+        if firstMove + chunkSize - 1 <= solutionLength(totalDisks):
+            chunk += bytes((packMove(*moveAt(firstMove + chunkSize - 1, totalDisks, source, target, spare)),))
+        yield chunk
+
+PLAN_CACHE_SIZE = 4096
+SOLVED_TOWERS = ("B", "C") # The towers that towerofhanoi.main() wins on.
+
+def packTowers(towers):
+    """Returns a position as bytes, with the index in PEGS of each disk's
+    tower, smallest disk first. towers is a towers dictionary or a
+    towerofhanoi.CompactTowers, which already keeps its disks this way."""
+    diskTowers = getattr(towers, "diskTowers", None)
+    if diskTowers is not None:
+        return bytes(diskTowers)
+    packed = bytearray(sum(len(tower) for tower in towers.values()))
+    for name, tower in towers.items():
+        for disk in tower:
+            packed[disk - 1] = PEGS.index(name)
+    return bytes(packed)
+
+@functools.lru_cache(maxsize=PLAN_CACHE_SIZE)
+def _planFrom(packed, targetPeg):
+    """Returns (moveCount, steps) for the fewest moves that put every disk
+    of a packed position on targetPeg (an index in PEGS).
+
+    Going from the largest disk down: a disk already on the target stays
+    put, and the smaller disks go to the same target. Otherwise, the
+    smaller disks must first go to the third peg, so the disk can move,
+    and then follow it as a tower, which takes 2 ** (disk - 1) - 1 moves.
+    steps has a (disk, fromPeg, toPeg, sparePeg) tuple for each disk that
+    moves, smallest first, which is the order they move in."""
+    moveCount = 0
+    steps = []
+    for disk in range(len(packed), 0, -1):
+        diskPeg = packed[disk - 1]
+        if diskPeg != targetPeg:
+            sparePeg = 3 - diskPeg - targetPeg
+            moveCount += 1 << (disk - 1) # The disk's move plus moving the tower onto it.
+            steps.append((disk, diskPeg, targetPeg, sparePeg))
+            targetPeg = sparePeg
+    steps.reverse()
+    return moveCount, tuple(steps)
+
+def _bestPlan(towers, targets):
+    packed = packTowers(towers)
+    return min((_planFrom(packed, PEGS.index(target)) for target in targets), key=lambda plan: plan[0])
+
+def solveFrom(towers, targets=SOLVED_TOWERS):
+    """Returns (moveCount, moves) for the fewest moves that finish a game
+    from any legal position: towers is a towers dictionary or a
+    CompactTowers, and the game is finished when every disk is on one of
+    targets. moves is an iterator of (fromTower, toTower) moves."""
+    moveCount, steps = _bestPlan(towers, targets)
+    return moveCount, _iterPlan(steps)
+
+def _iterPlan(steps):
+    for disk, fromPeg, toPeg, sparePeg in steps:
+        yield PEGS[fromPeg], PEGS[toPeg]
+        if disk > 1: # Move the smaller disks, waiting on sparePeg, on top of it.
+            yield from iterMoves(disk - 1, PEGS[sparePeg], PEGS[toPeg], PEGS[fromPeg])
+
+def hintFor(towers, targets=SOLVED_TOWERS):
+    """Returns (fromTower, toTower, moveCount) for the next move of the
+    fewest that finish the game, and how many moves that is, or None if
+    the game is already finished."""
+    moveCount, steps = _bestPlan(towers, targets)
+    if not steps:
+        return None
+    disk, fromPeg, toPeg, sparePeg = steps[0]
+    return PEGS[fromPeg], PEGS[toPeg], moveCount
+
+def benchHints(totalDisks=20, queries=10_000, seed=0):
+    """Times hintFor() on random legal positions, first with every
+    position new, then asking for the same positions again so the
+    answers come from the cache. Returns a dict of latencies in seconds."""
+    rng = random.Random(seed)
+    positions = [bytes(rng.randrange(3) for disk in range(totalDisks)) for query in range(queries)]
+    # Unpack them to towers dictionaries, like the game would ask with:
+    positions = [{name: [disk for disk in range(totalDisks, 0, -1) if packed[disk - 1] == pegIndex]
+                  for pegIndex, name in enumerate(PEGS)} for packed in positions]
+    results = {}
+    _planFrom.cache_clear()
+    for name in ("cold", "cached"):
+        latencies = []
+        for towers in positions[:PLAN_CACHE_SIZE // len(SOLVED_TOWERS)] if name == "cached" else positions:
+            startTime = time.perf_counter()
+            hintFor(towers)
+            latencies.append(time.perf_counter() - startTime)
+        latencies.sort()
+        results[name + "Mean"] = statistics.fmean(latencies)
+        results[name + "P50"] = latencies[len(latencies) // 2]
+        results[name + "P99"] = latencies[min(len(latencies) - 1, len(latencies) * 99 // 100)]
+    return results
+
+# _frameStewartTable[pegs] is a list with (moveCount, smallDisks) for
+# each number of disks, smallDisks being the best number to move aside
+# first. frameStewartCount() adds to it as bigger problems are asked for.
+_frameStewartTable = {}
+
+def _frameStewartRow(totalDisks, pegs):
+    """Returns the table row for pegs, filled in up to totalDisks."""
+    row = _frameStewartTable.setdefault(pegs, [(0, 0)])
+    if pegs > 3 and len(row) <= totalDisks:
+        fewerPegs = _frameStewartRow(totalDisks, pegs - 1)
+    for disks in range(len(row), totalDisks + 1):
+        if pegs == 3:
+            row.append((solutionLength(disks), 0))
+        else:
+            # Try every number of disks to move aside, and keep the best:
+            row.append(min((2 * row[smallDisks][0] + fewerPegs[disks - smallDisks][0], smallDisks)
+                           for smallDisks in range(1, disks)) if disks > 1 else (1, 0))
+    return row
+
+def frameStewartCount(totalDisks, pegs):
+    """Returns the number of moves in the Frame-Stewart solution for
+    totalDisks disks and pegs pegs."""
+    if pegs < 3:
+        raise ValueError("the Tower of Hanoi needs at least three pegs")
+    return _frameStewartRow(totalDisks, pegs)[totalDisks][0]
+
+def frameStewartMoves(totalDisks, pegNames="ABCD"):
+    """Yields the (fromTower, toTower) moves of the Frame-Stewart solution
+    for moving totalDisks disks from pegNames[0] to pegNames[1], using the
+    rest of pegNames as spares. The moves are worked out as they are
+    yielded, so there can be any number of them."""
+    if len(pegNames) < 3:
+        raise ValueError("the Tower of Hanoi needs at least three pegs")
+    _frameStewartRow(totalDisks, len(pegNames)) # Fill in the table up front.
+    return _iterFrameStewart(totalDisks, tuple(pegNames))
+
+def _iterFrameStewart(totalDisks, pegNames):
+    if totalDisks == 0:
+        return
+    source, target, *spares = pegNames
+    if len(pegNames) == 3:
+        yield from iterMoves(totalDisks, source, target, spares[0])
+        return
+    smallDisks = _frameStewartTable[len(pegNames)][totalDisks][1]
+    if smallDisks == 0: # Just the one disk.
+        yield source, target
+        return
+    aside = spares[0]
+    yield from _iterFrameStewart(smallDisks, (source, aside, target, *spares[1:]))
+    yield from _iterFrameStewart(totalDisks - smallDisks, (source, target, *spares[1:]))
+    yield from _iterFrameStewart(smallDisks, (aside, target, source, *spares[1:]))
+
+def benchFrameStewart(pegCounts=range(4, 9), maxDisks=64, movesPerRun=1_000_000):
+    """Times filling in the Frame-Stewart table, from empty, up to maxDisks
+    disks for each number of pegs, looking the counts up again once it is filled
+    in, and streaming up to movesPerRun moves of the maxDisks solution.
+    Returns a list of report dicts, one per number of pegs."""
+    reports = []
+    for pegs in pegCounts:
+        _frameStewartTable.clear()
+        startTime = time.perf_counter()
+        frameStewartCount(maxDisks, pegs)
+        tableSeconds = time.perf_counter() - startTime
+
+        startTime = time.perf_counter()
+        for disks in range(maxDisks + 1):
+            frameStewartCount(disks, pegs)
+        lookupSeconds = (time.perf_counter() - startTime) / (maxDisks + 1)
+
+        moveCount = 0
+        startTime = time.perf_counter()
+        for move in frameStewartMoves(maxDisks, ALL_PEG_NAMES[:pegs]):
+            moveCount += 1
+            if moveCount == movesPerRun:
+                break
+        moveSeconds = time.perf_counter() - startTime
+        reports.append({
+            "pegs": pegs,
+            "disks": maxDisks,
+            "moveCount": frameStewartCount(maxDisks, pegs),
+            "tableSeconds": tableSeconds,
+            "lookupSeconds": lookupSeconds,
+            "movesStreamed": moveCount,
+            "movesPerSecond": moveCount / moveSeconds if moveSeconds else 0.0,
+        })
+    return reports
+
+MAX_VIOLATIONS_PER_RANGE = 100
+
+def _verifyRange(args):
+    """Replays moves first up to last from towersAfter(first - 1), and
+    returns (moveCount, violations): a list of (moveNumber, fromTower,
+    toTower, reason) tuples. A range with too few or too many moves is
+    a violation too."""
+    totalDisks, source, target, spare, moveSource, first, last = args
+    towers = towersAfter(first - 1, totalDisks, source, target, spare)
+    violations = []
+    moveCount = 0
+    for moveNumber, (fromTower, toTower) in enumerate(moveSource(totalDisks, source, target, spare, first, last),
+                                                     start=first):
+        if len(violations) >= MAX_VIOLATIONS_PER_RANGE:
+            return moveCount, violations # Too broken to be worth checking the rest of.
+        if moveNumber >= last:
+            violations.append((moveNumber, fromTower, toTower, f"the range should end after move {last - 1:,}"))
+            return moveCount, violations
+        moveCount += 1
+        if fromTower not in towers or toTower not in towers or fromTower == toTower:
+            violations.append((moveNumber, fromTower, toTower, "not a move between two towers"))
+        elif not towers[fromTower]:
+            violations.append((moveNumber, fromTower, toTower, "no disk on the from tower"))
+        elif towers[toTower] and towers[toTower][-1] < towers[fromTower][-1]:
+            violations.append((moveNumber, fromTower, toTower, "larger disk on a smaller one"))
+        else:
+            towers[toTower].append(towers[fromTower].pop())
+            continue
+        # Carry on from where the solution should be, so one bad move
+        # doesn't make every move after it in the range look bad too:
+        towers = towersAfter(moveNumber, totalDisks, source, target, spare)
+    if moveCount < last - first:
+        violations.append((first + moveCount, None, None,
+                           f"the range stops after {moveCount:,} of its {last - first:,} moves"))
+    elif not violations and towers != towersAfter(last - 1, totalDisks, source, target, spare):
+        violations.append((last - 1, None, None, "towers don't match the solution at the end of the range"))
+    return moveCount, violations
+
+def verifyMoves(totalDisks, source="A", target="C", spare="B", moveSource=iterMoves, processes=None,
+                rangeSize=1 << 20):
+    """Checks a Tower of Hanoi solution in parallel. moveSource(totalDisks,
+    source, target, spare, start, stop) must return moves start up to
+    stop of the solution, like iterMoves() does, and be a module-level
+    function so it can be sent to other processes. Returns a report
+    dict, with the violations found sorted by move number."""
+    total = solutionLength(totalDisks)
+    ranges = [(totalDisks, source, target, spare, moveSource, first, min(first + rangeSize, total + 1))
+              for first in range(1, total + 1, rangeSize)]
+    processes = processes or os.cpu_count()
+    startTime = time.perf_counter()
+    if processes == 1:
+        results = list(map(_verifyRange, ranges))
+    else:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = list(executor.map(_verifyRange, ranges))
+    seconds = time.perf_counter() - startTime
+    moveCount = sum(count for count, violations in results)
+    violations = [violation for count, violations in results for violation in violations]
+    if moveCount != total:
+        violations.append((total, None, None, f"checked {moveCount:,} moves, but the solution has {total:,}"))
+    return {
+        "disks": totalDisks,
+        "moves": moveCount,
+        "ranges": len(ranges),
+        "processes": processes,
+        "violations": sorted(violations, key=lambda violation: violation[0]), # Some towers are None.
+        "seconds": seconds,
+        "movesPerSecond": moveCount / seconds if seconds else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Time generating the optimal Tower of Hanoi solution.")
+    parser.add_argument("disks", type=int)
+    parser.add_argument("--chunks", action="store_true", help="generate packed chunks instead of one move at a time")
+    parser.add_argument("--limit", type=int, default=None, help="stop after about this many moves")
+    parser.add_argument("--verify", action="store_true", help="check the whole solution in parallel instead")
+    parser.add_argument("--processes", type=int, default=None, help="default: one per CPU")
+    parser.add_argument("--hints", type=int, metavar="N", help="time hints for N random positions instead")
+    parser.add_argument("--pegs", type=int, default=3, help="number of pegs, up to 8 (Frame-Stewart for more than 3)")
+    parser.add_argument("--frame-stewart", action="store_true",
+                        help="time the Frame-Stewart solver for 4 to 8 pegs and up to DISKS disks instead")
+    args = parser.parse_args()
+
+    if args.frame_stewart:
+        for report in benchFrameStewart(maxDisks=args.disks):
+            print(f"{report['pegs']} pegs, {report['disks']} disks: {report['moveCount']:,} moves; "
+                  f"table {report['tableSeconds'] * 1000:.2f} ms, cached lookup {report['lookupSeconds'] * 1e6:.2f} us; "
+                  f"{report['movesPerSecond']:,.0f} moves/sec streaming {report['movesStreamed']:,} moves")
+        return
+
+    if args.pegs != 3:
+        totalMoves = frameStewartCount(args.disks, args.pegs)
+        limit = totalMoves if args.limit is None else min(args.limit, totalMoves)
+        startTime = time.perf_counter()
+        moveCount = 0
+        for move in frameStewartMoves(args.disks, ALL_PEG_NAMES[:args.pegs]):
+            moveCount += 1
+            if moveCount == limit:
+                break
+        seconds = time.perf_counter() - startTime
+        print(f"{moveCount:,} of {totalMoves:,} moves in {seconds:.2f} seconds ({moveCount / seconds:,.0f} moves/sec)")
+        return
+
+    if args.hints:
+        results = benchHints(args.disks, args.hints)
+        for name in ("cold", "cached"):
+            print(f"{name:>6} hints: mean {results[name + 'Mean'] * 1e6:.1f} us, "
+                  f"p50 {results[name + 'P50'] * 1e6:.1f} us, p99 {results[name + 'P99'] * 1e6:.1f} us")
+        return
+
+    if args.verify:
+        report = verifyMoves(args.disks, processes=args.processes)
+        print(f"Checked {report['moves']:,} moves in {report['ranges']:,} ranges with {report['processes']} "
+              f"processes in {report['seconds']:.2f} seconds ({report['movesPerSecond']:,.0f} moves/sec).")
+        print(f"{len(report['violations']):,} violations.")
+        for moveNumber, fromTower, toTower, reason in report["violations"][:20]:
+            print(f"  move {moveNumber:,} ({fromTower}{toTower}): {reason}")
+        return
+
+    limit = solutionLength(args.disks) if args.limit is None else min(args.limit, solutionLength(args.disks))
+    startTime = time.perf_counter()
+    moveCount = 0
+    if args.chunks:
+        for chunk in iterMoveChunks(args.disks):
+            moveCount += len(chunk)
+            if moveCount >= limit:
+                break
+    else:
+        for move in iterMoves(args.disks, stop=limit + 1):
+            moveCount += 1
+    seconds = time.perf_counter() - startTime
+    print(f"{moveCount:,} of {solutionLength(args.disks):,} moves in {seconds:.2f} seconds "
+          f"({moveCount / seconds:,.0f} moves/sec)")
+
+if __name__ == "__main__":
+    main()
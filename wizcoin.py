@@ -1,30 +1,88 @@
 #! /usr/bin/python3
 
 import collections.abc
+import functools
 import operator
+import re
 
 class WizCoinException(Exception):
     '''The wizcoin module raises this when a module is misused.'''
     pass
 
 class WizCoin:
+    # __slots__ replaces the per-object __dict__ with fixed storage for
+    # the three coin counts, which makes each WizCoin object smaller.
+    __slots__ = ('_galleons', '_sickles', '_knuts', '_total')
+
     def __init__(self, galleons, sickles, knuts):
         """Create a new WizCoin object with galleons, sickles and knuts."""
+        # The setters update the cached _total by the change in each
+        # coin count, so start everything off at zero:
+        self._galleons = self._sickles = self._knuts = self._total = 0
         self.galleons = galleons
         self.sickles = sickles
         self.knuts = knuts
         # NOTE: __init__() methods NEVER have a return statement
 
+    @classmethod
+    def _fromTrusted(cls, galleons, sickles, knuts, total=None):
+        """Create a new WizCoin object from coin counts that are already
+        known to be non-negative ints, skipping the property setters.
+        Pass total if the knut total of the coins is already known."""
+        purse = object.__new__(cls)
+        purse._galleons = galleons
+        purse._sickles = sickles
+        purse._knuts = knuts
+        if total is None:
+            total = (galleons * 17 * 29) + (sickles * 29) + knuts
+        purse._total = total
+        return purse
+
     def total(self): # so, if purse=Wizcoin(2,5,9), you can use purse.total()
         """The value (in knuts) of all the coins in thie WizCoin object."""
-        return (self.galleons * 17 * 29) + (self.sickles * 29) + (self.knuts)
+        return self._total # kept up to date by the setters, see below
 
     # demonstrate how the total2 method could be rendered as an RO property
     # (no getter or setter methods - see wizcoinexample.py)
     @property
     def total2(self):
         """The value (in knuts) of all the coins in thie WizCoin object."""
-        return (self.galleons * 17 * 29) + (self.sickles * 29) + (self.knuts)
+        return self._total
+
+    @classmethod
+    def fromKnuts(cls, knuts):
+        """Create a new WizCoin object worth knuts knuts, using as many
+        galleons and sickles as possible (17 sickles to a galleon and
+        29 knuts to a sickle)."""
+        if not isinstance(knuts, int):
+            raise WizCoinException('knuts must be an int, not ' + knuts.__class__.__qualname__)
+        if knuts < 0:
+            raise WizCoinException('knuts must be a positive int, not a negative ' + knuts.__class__.__qualname__)
+        sickles, remainingKnuts = divmod(knuts, 29)
+        galleons, sickles = divmod(sickles, 17)
+        return cls._fromTrusted(galleons, sickles, remainingKnuts, knuts)
+
+    @classmethod
+    def fromString(cls, text):
+        """Create a new WizCoin object from its str() form, e.g. '2g, 5s, 99k'."""
+        return cls._fromTrusted(*_parseStr(text))
+
+    @classmethod
+    def fromRepr(cls, text):
+        """Create a new WizCoin object from its repr() form, e.g.
+        'WizCoin(2, 5, 99)' or 'FrozenWizCoin(2, 5, 99)', optionally
+        with a 'wizcoin.' prefix. Unlike eval(), this never runs any code."""
+        return cls._fromTrusted(*_parseRepr(text))
+
+    def freeze(self):
+        """Returns an immutable, hashable FrozenWizCoin with the same coins."""
+        return FrozenWizCoin._fromTrusted(self._galleons, self._sickles, self._knuts, self._total)
+
+    def normalized(self):
+        """Returns a new WizCoin object with the same value as this one in
+        its canonical form: knuts < 29 and sickles < 17. Purses with equal
+        values have the same normalized form."""
+        return self.fromKnuts(self._total)
 
     def weightInGrams(self):
         """Returns the weight of the coins in grams."""
@@ -42,6 +100,7 @@ class WizCoin:
             raise WizCoinException('galleons attr must be set to an int, not ' + value.__class__.__qualname__)
         if value < 0:
             raise WizCoinException('galleons must be a positive int, not a negative' + value.__class__.__qualname__)
+        self._total += (value - self._galleons) * 17 * 29 # only the change in value
         self._galleons = value # modify the original object with the new value
 
     @property
@@ -55,6 +114,7 @@ class WizCoin:
             raise WizCoinException('sickles attr must be set to an int, not ' + value.__class__.__qualname__)
         if value < 0:
             raise WizCoinException('sickles must be a positive int, not a negative' + value.__class__.__qualname__)
+        self._total += (value - self._sickles) * 29
         self._sickles = value
 
     @property
@@ -68,6 +128,7 @@ class WizCoin:
             raise WizCoinException('knuts attr must be set to an int, not ' + value.__class__.__qualname__)
         if value < 0:
             raise WizCoinException('knuts must be a positive int, not a negative' + value.__class__.__qualname__)
+        self._total += value - self._knuts
         self._knuts = value
 
     # Dunder methods - (double underscore methods)
@@ -85,14 +146,16 @@ class WizCoin:
         if not isinstance(other,WizCoin): #The isinstance() function returns True if the specified object is of the
             # specified type, otherwise False.
                 return NotImplemented
-        return WizCoin(other.galleons + self.galleons, other.sickles + self.sickles, other.knuts + self.knuts)
+        # Sums of valid coin counts are always valid, so skip the setters:
+        return self._fromTrusted(other._galleons + self._galleons, other._sickles + self._sickles, other._knuts + self._knuts,
+                                 other._total + self._total)
 
     def __sub__(self,other):
         """Subtracts the coin amounts in two WizCoin objects together."""
         if not isinstance(other,WizCoin): #The isinstance() function returns True if the specified object is of the
             # specified type, otherwise False.
                 return NotImplemented
-        return WizCoin(self.galleons - other.galleons, self.sickles - other.sickles, self.knuts - other.knuts)
+        return self.__class__(self.galleons - other.galleons, self.sickles - other.sickles, self.knuts - other.knuts)
 
     def __mul__(self, other):
         """Multiplies the coin amounts by a non-negative integer."""
@@ -103,7 +166,8 @@ class WizCoin:
         # Multiplying by a negative int results in negative
         #  amounts of coins, which is invalid.
             raise WizCoinException('cannot multiply with negative integers')
-        return WizCoin(self.galleons * other, self.sickles * other, self.knuts * other)
+        return self._fromTrusted(self._galleons * other, self._sickles * other, self._knuts * other,
+                                 self._total * other)
 
     # for Reflected Dunder methods -> when wizcoin object is on right side of the operator
     # (example: 10 * purse). Since multiplication is cummutative (works the same
@@ -126,10 +190,13 @@ return NotImplemented, Python raises a TypeError exception."""
             # specified object is of the specified type, otherwise False.
             return NotImplemented
 
-        # We modify the 'self' object in place:
-        self.galleons += other.galleons
-        self.sickles += other.sickles
-        self.knuts += other.knuts
+        # We modify the 'self' object in place. Adding valid coin counts
+        # can't make them invalid, so skip the setters and update the
+        # cached total with the other object's total:
+        self._galleons += other._galleons
+        self._sickles += other._sickles
+        self._knuts += other._knuts
+        self._total += other._total
         return self # In place dunder methods almost awyas return self.
 
 
@@ -147,9 +214,10 @@ return NotImplemented, Python raises a TypeError exception."""
         #return Wizcoin(self.galleons * other, self.sickles * other, self.knuts * other)
 
         # We modify the 'self' object in place:
-        self.galleons *= other
-        self.sickles *= other
-        self.knuts *= other
+        self._galleons *= other
+        self._sickles *= other
+        self._knuts *= other
+        self._total *= other
         return self # In-place dunder methods almost always return self.
 
     # Study of overloading comparison operators ('>', '<', '>=', etc...) to
@@ -174,19 +242,216 @@ return NotImplemented, Python raises a TypeError exception."""
         else:
             return NotImplemented
 
-    # overload the standard operator functions with wizcoin specific code
+    # overload the standard operator functions with wizcoin specific code.
+    # comparisonOperatorHelper() runs a chain of isinstance() checks on
+    # every comparison, which is slow when sorting millions of purses. So
+    # each method first checks for the two common cases, another WizCoin
+    # or an int, and compares the cached totals directly. Other types are
+    # looked up by their exact class in the _OTHER_TOTAL dispatch table,
+    # and anything not in the table still goes through the helper. All six
+    # methods compare the same knut totals, so they always agree with each
+    # other the way functools.total_ordering would make them.
+    def _compare(self, operatorFunc, other):
+        """Compares with an operand that isn't a WizCoin or an int."""
+        otherTotal = _OTHER_TOTAL.get(other.__class__)
+        if otherTotal is None:
+            return self.comparisonOperatorHelper(operatorFunc, other)
+        return operatorFunc(self._total, otherTotal(other))
+
     def __eq__(self,other): # eq is "Equal"
-        return self.comparisonOperatorHelper(operator.eq,other) # the operator.eq
-        # function is passed into comparisonOperatorHelper() as operatorFunc
+        if other.__class__ in _PURSE_CLASSES:
+            return self._total == other._total
+        if other.__class__ is int:
+            return self._total == other
+        return self._compare(operator.eq,other) # the operator.eq
+        # function is passed into _compare() as operatorFunc
     def __ne__(self, other): # ne is "Not Equal"
-        return self.comparisonOperatorHelper(operator.ne,other)
+        if other.__class__ in _PURSE_CLASSES:
+            return self._total != other._total
+        if other.__class__ is int:
+            return self._total != other
+        return self._compare(operator.ne,other)
     def __lt__(self, other): # lt is "Less Than"
-        return self.comparisonOperatorHelper(operator.lt,other)
+        if other.__class__ in _PURSE_CLASSES:
+            return self._total < other._total
+        if other.__class__ is int:
+            return self._total < other
+        return self._compare(operator.lt,other)
     def __le__(self, other): # le is "Less Than or Equal"
-        return self.comparisonOperatorHelper(operator.le,other)
+        if other.__class__ in _PURSE_CLASSES:
+            return self._total <= other._total
+        if other.__class__ is int:
+            return self._total <= other
+        return self._compare(operator.le,other)
     def __gt__(self, other): # gt is "Greater Than"
-        return self.comparisonOperatorHelper(operator.gt,other)
+        if other.__class__ in _PURSE_CLASSES:
+            return self._total > other._total
+        if other.__class__ is int:
+            return self._total > other
+        return self._compare(operator.gt,other)
     def __ge__(self, other): # ge is "Greater than or Equal"
-        return self.comparisonOperatorHelper(operator.ge,other)
+        if other.__class__ in _PURSE_CLASSES:
+            return self._total >= other._total
+        if other.__class__ is int:
+            return self._total >= other
+        return self._compare(operator.ge,other)
+
+    # WizCoin objects are mutable (see __iadd__() and __imul__()), so their
+    # value can change while they sit in a set or as a dict key. Defining
+    # __eq__() already sets __hash__ to None; we spell it out here. To sort
+    # or bucket purses by value, use totalKey() or bucketByTotal() below,
+    # and to use an amount as a dict key, use freeze().
+    __hash__ = None
+
+def _refuseChange(self, value):
+    raise WizCoinException(self.__class__.__qualname__ + ' objects are immutable, use thaw() for a mutable copy')
+
+class FrozenWizCoin(WizCoin):
+    """An immutable WizCoin that can be used as a dict key or in a set.
+    Its hash is the hash of its knut total, so it matches the hash of
+    every equal FrozenWizCoin and of the equal int."""
+    __slots__ = ()
+
+    # Small amounts come up all the time, so FrozenWizCoin objects with
+    # fewer than INTERN_GALLEONS galleons, 17 sickles and 29 knuts are
+    # created once and shared:
+    INTERN_GALLEONS = 10
+    _interned = {}
+
+    def __new__(cls, galleons, sickles, knuts):
+        purse = WizCoin(galleons, sickles, knuts) # Use WizCoin's setters to check the coin counts.
+        return cls._fromTrusted(purse._galleons, purse._sickles, purse._knuts, purse._total)
+
+    def __init__(self, galleons, sickles, knuts):
+        pass # __new__() already set up this object, and it can't be changed.
+
+    @classmethod
+    def _fromTrusted(cls, galleons, sickles, knuts, total=None):
+        if cls is not FrozenWizCoin:
+            return super()._fromTrusted(galleons, sickles, knuts, total)
+        key = (galleons, sickles, knuts)
+        purse = cls._interned.get(key)
+        if purse is None:
+            purse = super()._fromTrusted(galleons, sickles, knuts, total)
+            if galleons < cls.INTERN_GALLEONS and sickles < 17 and knuts < 29:
+                cls._interned[key] = purse
+        return purse
+
+    # The coin counts can be read but not set:
+    galleons = property(WizCoin.galleons.fget, _refuseChange)
+    sickles = property(WizCoin.sickles.fget, _refuseChange)
+    knuts = property(WizCoin.knuts.fget, _refuseChange)
+
+    def freeze(self):
+        """Returns this object, since it is already frozen."""
+        return self
+
+    def thaw(self):
+        """Returns a mutable WizCoin with the same coins."""
+        return WizCoin._fromTrusted(self._galleons, self._sickles, self._knuts, self._total)
+
+    # Like a tuple, a FrozenWizCoin can't be changed in place. Returning
+    # NotImplemented makes Python fall back to __add__() and __mul__(),
+    # so purse += other rebinds purse to a new FrozenWizCoin instead.
+    def __iadd__(self, other):
+        return NotImplemented
+
+    def __imul__(self, other):
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self._total)
+
+    def __reduce__(self): # Lets pickle and copy re-create the object through __new__().
+        return (self.__class__, (self._galleons, self._sickles, self._knuts))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+def _sequenceTotal(other):
+    return (other[0] * 17 * 29) + (other[1] * 29) + other[2]
+
+# The comparison fast paths, see WizCoin._compare(). _OTHER_TOTAL maps
+# the exact class of the other operand to a function that returns its
+# value in knuts.
+_PURSE_CLASSES = frozenset((WizCoin, FrozenWizCoin))
+_OTHER_TOTAL = {WizCoin: lambda purse: purse._total,
+                FrozenWizCoin: lambda purse: purse._total,
+                int: lambda number: number,
+                float: lambda number: number,
+                tuple: _sequenceTotal,
+                list: _sequenceTotal}
+
+# Compiled once, and used by fromString(), fromRepr() and parseMany():
+_STR_PATTERN = re.compile(r'\s*(\d+)g,\s*(\d+)s,\s*(\d+)k\s*')
+_REPR_PATTERN = re.compile(r'\s*(?:wizcoin\.)?(?:Frozen)?WizCoin\(\s*(\d+),\s*(\d+),\s*(\d+)\s*\)\s*')
+
+# The same few amounts get parsed over and over, so the parsed
+# (galleons, sickles, knuts) tuples are kept in a bounded LRU cache.
+# Tuples are immutable, so sharing them between callers is safe.
+PARSE_CACHE_SIZE = 4096
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parseStr(text):
+    match = _STR_PATTERN.fullmatch(text)
+    if match is None:
+        raise WizCoinException('not a WizCoin string: ' + repr(text))
+    return int(match[1]), int(match[2]), int(match[3])
+
+@functools.lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parseRepr(text):
+    match = _REPR_PATTERN.fullmatch(text)
+    if match is None:
+        raise WizCoinException('not a WizCoin repr: ' + repr(text))
+    return int(match[1]), int(match[2]), int(match[3])
+
+def parseMany(texts):
+    """Returns a list of WizCoin objects parsed from an iterable of strings,
+    each of which is either the str() or the repr() form of a WizCoin."""
+    parseStr, parseRepr, fromTrusted = _parseStr, _parseRepr, WizCoin._fromTrusted
+    purses = []
+    for text in texts:
+        if text.rstrip().endswith(')'):
+            purses.append(fromTrusted(*parseRepr(text)))
+        else:
+            purses.append(fromTrusted(*parseStr(text)))
+    return purses
+
+def totalKey(purse):
+    """Returns the cached knut total of purse, for use as a sort key, e.g.
+    sorted(purses, key=wizcoin.totalKey)."""
+    return purse._total
+
+def bucketByTotal(purses):
+    """Returns a dict that maps each knut total to a list of the purses
+    in purses with that total value."""
+    buckets = {}
+    for purse in purses:
+        buckets.setdefault(purse._total, []).append(purse)
+    return buckets
 
+def makeChange(amount, inventory=None):
+    """Returns a WizCoin worth amount (an int of knuts, or a WizCoin) made
+    of as few coins as possible, using no more coins of each kind than the
+    inventory WizCoin holds. Raises WizCoinException if the inventory can't
+    make the amount. With no inventory, this is the same as fromKnuts()."""
+    if isinstance(amount, WizCoin):
+        amount = amount._total
+    if inventory is None:
+        return WizCoin.fromKnuts(amount)
+    if not isinstance(amount, int) or amount < 0:
+        raise WizCoinException('amount must be a positive int or a WizCoin, not ' + repr(amount))
 
+    # Each coin is worth a whole number of the next smaller coin, so taking
+    # as many of the largest coin as possible is always optimal, and if it
+    # leaves an amount the smaller coins can't make, nothing else would work:
+    galleons = min(inventory._galleons, amount // (17 * 29))
+    remaining = amount - galleons * 17 * 29
+    sickles = min(inventory._sickles, remaining // 29)
+    knuts = remaining - sickles * 29
+    if knuts > inventory._knuts:
+        raise WizCoinException('cannot make change for ' + str(amount) + ' knuts from ' + str(inventory))
+    return WizCoin._fromTrusted(galleons, sickles, knuts, amount)
@@ -0,0 +1,282 @@
+#! /usr/bin/python3
+'''A NumPy-backed column store for working with many WizCoin amounts at once.
+
+Where a list of WizCoin objects pays for one object and three validating
+property setters per purse, a WizCoinArray keeps the galleons, sickles and
+knuts of every purse in three int64 columns and validates a whole batch
+with a single check.'''
+
+import operator
+
+import numpy as np
+
+from wizcoin import WizCoin, WizCoinException
+
+KNUTS_PER_GALLEON = 17 * 29
+KNUTS_PER_SICKLE = 29
+INT64_MAX = int(np.iinfo(np.int64).max)
+
+def _toColumn(name, values):
+    '''Returns values as a 1-D int64 array, raising WizCoinException if
+    they are not integers.'''
+    column = np.asarray(values)
+    if column.dtype.kind not in 'iu' and not (column.size == 0 and column.dtype.kind == 'f'):
+        raise WizCoinException(name + ' must be integers, not ' + str(column.dtype))
+    if column.dtype == np.uint64 and (column > INT64_MAX).any():
+        raise WizCoinException(name + ' must fit in an int64')
+    return np.atleast_1d(column).astype(np.int64, copy=False)
+
+def _checkedAdd(column, other):
+    '''Returns column + other, raising WizCoinException instead of letting
+    the int64 sum overflow. Both must be non-negative.'''
+    if (column > INT64_MAX - other).any():
+        raise WizCoinException('coin counts must fit in an int64')
+    return column + other
+
+class WizCoinArray:
+    def __init__(self, galleons, sickles, knuts):
+        """Create a new WizCoinArray from three equal-length columns of
+        galleons, sickles and knuts."""
+        galleons = _toColumn('galleons', galleons)
+        sickles = _toColumn('sickles', sickles)
+        knuts = _toColumn('knuts', knuts)
+        if not (galleons.shape == sickles.shape == knuts.shape) or galleons.ndim != 1:
+            raise WizCoinException('galleons, sickles and knuts must be 1-D columns of the same length')
+        # Validate the whole batch once, instead of once per attribute write:
+        if (galleons < 0).any() or (sickles < 0).any() or (knuts < 0).any():
+            raise WizCoinException('coin counts must be positive ints, not negative')
+        self._galleons = galleons
+        self._sickles = sickles
+        self._knuts = knuts
+
+    @classmethod
+    def _fromTrusted(cls, galleons, sickles, knuts):
+        """Wraps columns that are already known to be valid without
+        checking them again."""
+        coins = cls.__new__(cls)
+        coins._galleons = galleons
+        coins._sickles = sickles
+        coins._knuts = knuts
+        return coins
+
+    @classmethod
+    def fromWizCoins(cls, purses):
+        """Create a WizCoinArray from an iterable of WizCoin objects."""
+        purses = list(purses)
+        return cls._fromTrusted(np.fromiter((p.galleons for p in purses), np.int64, len(purses)),
+                                np.fromiter((p.sickles for p in purses), np.int64, len(purses)),
+                                np.fromiter((p.knuts for p in purses), np.int64, len(purses)))
+
+    @classmethod
+    def fromKnuts(cls, knuts):
+        """Create a WizCoinArray of normalized purses from an array of
+        knut amounts, using as many galleons and sickles as possible."""
+        knuts = _toColumn('knuts', knuts)
+        if (knuts < 0).any():
+            raise WizCoinException('knuts must be positive ints, not negative')
+        sickles, remainingKnuts = np.divmod(knuts, KNUTS_PER_SICKLE)
+        galleons, sickles = np.divmod(sickles, 17)
+        return cls._fromTrusted(galleons, sickles, remainingKnuts)
+
+    def normalized(self):
+        """Returns a new WizCoinArray with every purse in its canonical
+        form, the way WizCoin.normalized() does for a single purse."""
+        return self.fromKnuts(self.total())
+
+    def toWizCoins(self):
+        """Returns a list with one WizCoin object per purse."""
+        return [WizCoin(g, s, k) for g, s, k in zip(self._galleons.tolist(),
+                                                    self._sickles.tolist(),
+                                                    self._knuts.tolist())]
+
+    @staticmethod
+    def _readOnly(column):
+        view = column.view()
+        view.flags.writeable = False
+        return view
+
+    @property
+    def galleons(self):
+        '''Returns a read-only column of the galleons in each purse.'''
+        return self._readOnly(self._galleons)
+
+    @property
+    def sickles(self):
+        '''Returns a read-only column of the sickles in each purse.'''
+        return self._readOnly(self._sickles)
+
+    @property
+    def knuts(self):
+        '''Returns a read-only column of the knuts in each purse.'''
+        return self._readOnly(self._knuts)
+
+    def total(self):
+        """The value (in knuts) of each purse, as an int64 array. Raises
+        WizCoinException if a purse is worth more than an int64 holds."""
+        galleons, sickles, knuts = self._galleons, self._sickles, self._knuts
+        if len(galleons) and not (galleons.max() <= INT64_MAX // KNUTS_PER_GALLEON // 3
+                                  and sickles.max() <= INT64_MAX // KNUTS_PER_SICKLE // 3
+                                  and knuts.max() <= INT64_MAX // 3):
+            # Some purse might not fit, so check each step for overflow:
+            if (galleons > INT64_MAX // KNUTS_PER_GALLEON).any() or (sickles > INT64_MAX // KNUTS_PER_SICKLE).any():
+                raise WizCoinException('purse totals must fit in an int64')
+            galleonKnuts, sickleKnuts = galleons * KNUTS_PER_GALLEON, sickles * KNUTS_PER_SICKLE
+            if (galleonKnuts > INT64_MAX - sickleKnuts).any() or (galleonKnuts + sickleKnuts > INT64_MAX - knuts).any():
+                raise WizCoinException('purse totals must fit in an int64')
+            return galleonKnuts + sickleKnuts + knuts
+        return galleons * KNUTS_PER_GALLEON + sickles * KNUTS_PER_SICKLE + knuts
+
+    def weightInGrams(self):
+        """Returns the weight of each purse in grams, as a float64 array."""
+        return self._galleons * 31.103 + self._sickles * 11.34 + self._knuts * 5.0
+
+    # Reductions return a single WizCoin object:
+    def sum(self):
+        """Returns a WizCoin holding the coins of every purse added together."""
+        return WizCoin(self._columnSum(self._galleons), self._columnSum(self._sickles), self._columnSum(self._knuts))
+
+    @staticmethod
+    def _columnSum(column):
+        if len(column) == 0 or int(column.max()) <= INT64_MAX // len(column):
+            return int(column.sum()) # The int64 sum can't overflow.
+        return sum(column.tolist()) # WizCoin holds Python ints, so add them up exactly.
+
+    def min(self):
+        """Returns the purse with the smallest total value as a WizCoin."""
+        return self[int(self.total().argmin())]
+
+    def max(self):
+        """Returns the purse with the largest total value as a WizCoin."""
+        return self[int(self.total().argmax())]
+
+    # Container dunder methods:
+    def __len__(self):
+        return len(self._galleons)
+
+    def __getitem__(self, index):
+        """Returns a WizCoin for an int index, or a WizCoinArray for a slice,
+        index array or boolean mask."""
+        if isinstance(index, (int, np.integer)):
+            return WizCoin(int(self._galleons[index]), int(self._sickles[index]), int(self._knuts[index]))
+        return self._fromTrusted(self._galleons[index], self._sickles[index], self._knuts[index])
+
+    def __iter__(self):
+        return iter(self.toWizCoins())
+
+    def __repr__(self):
+        return (f'{self.__class__.__qualname__}({self._galleons.tolist()}, '
+                f'{self._sickles.tolist()}, {self._knuts.tolist()})')
+
+    # Arithmetic dunder methods work element-wise. A single WizCoin is
+    # broadcast across every purse in the array.
+    def _otherColumns(self, other):
+        if isinstance(other, WizCoinArray):
+            if len(other) != len(self):
+                raise WizCoinException('WizCoinArray lengths differ: ' + str(len(self)) + ' and ' + str(len(other)))
+            return other._galleons, other._sickles, other._knuts
+        if isinstance(other, WizCoin):
+            if max(other.galleons, other.sickles, other.knuts) > INT64_MAX:
+                raise WizCoinException('coin counts must fit in an int64')
+            return other.galleons, other.sickles, other.knuts
+        return None
+
+    def __add__(self, other):
+        """Adds the coin amounts purse by purse."""
+        columns = self._otherColumns(other)
+        if columns is None:
+            return NotImplemented
+        return self._fromTrusted(_checkedAdd(self._galleons, columns[0]),
+                                 _checkedAdd(self._sickles, columns[1]),
+                                 _checkedAdd(self._knuts, columns[2]))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """Subtracts the coin amounts purse by purse."""
+        columns = self._otherColumns(other)
+        if columns is None:
+            return NotImplemented
+        # The WizCoinArray constructor checks the whole result for negatives:
+        return WizCoinArray(self._galleons - columns[0], self._sickles - columns[1], self._knuts - columns[2])
+
+    def __rsub__(self, other):
+        columns = self._otherColumns(other)
+        if columns is None:
+            return NotImplemented
+        return WizCoinArray(columns[0] - self._galleons, columns[1] - self._sickles, columns[2] - self._knuts)
+
+    def __mul__(self, other):
+        """Multiplies every purse by a non-negative integer."""
+        if not isinstance(other, (int, np.integer)) or isinstance(other, bool):
+            return NotImplemented
+        other = int(other) # An np.uint64 would turn the int64 columns into float64.
+        if other < 0:
+            raise WizCoinException('cannot multiply with negative integers')
+        if other > INT64_MAX:
+            raise WizCoinException('cannot multiply by more than ' + str(INT64_MAX))
+        columns = (self._galleons, self._sickles, self._knuts)
+        if other and any((column > INT64_MAX // other).any() for column in columns):
+            raise WizCoinException('coin counts must fit in an int64')
+        return self._fromTrusted(*(column * other for column in columns))
+
+    __rmul__ = __mul__
+
+    # Comparison operators compare total values and return boolean arrays,
+    # the same way NumPy's own comparisons do.
+    def comparisonOperatorHelper(self, operatorFunc, other):
+        """A helper method for our comparison dunder methods."""
+        if isinstance(other, WizCoinArray):
+            return operatorFunc(self.total(), other.total())
+        elif isinstance(other, WizCoin):
+            return operatorFunc(self.total(), other.total())
+        elif isinstance(other, (int, float, np.integer, np.floating, np.ndarray)):
+            return operatorFunc(self.total(), other)
+        return NotImplemented
+
+    def __eq__(self, other):
+        return self.comparisonOperatorHelper(operator.eq, other)
+    def __ne__(self, other):
+        return self.comparisonOperatorHelper(operator.ne, other)
+    def __lt__(self, other):
+        return self.comparisonOperatorHelper(operator.lt, other)
+    def __le__(self, other):
+        return self.comparisonOperatorHelper(operator.le, other)
+    def __gt__(self, other):
+        return self.comparisonOperatorHelper(operator.gt, other)
+    def __ge__(self, other):
+        return self.comparisonOperatorHelper(operator.ge, other)
+
+    # __eq__ returns an array, so WizCoinArray objects can't be hashed:
+    __hash__ = None
+
+def makeChange(amounts, inventory):
+    """Makes change for every amount in amounts (an array of knuts, or a
+    WizCoinArray) the way wizcoin.makeChange() does for one amount.
+    inventory is a WizCoin shared by every amount, or a WizCoinArray with
+    one inventory per amount (e.g. one per till).
+
+    Returns a (change, feasible) tuple: change is a WizCoinArray, and
+    feasible is a boolean array that is False where the inventory can't
+    make the amount. Those rows of change hold no coins."""
+    if isinstance(amounts, WizCoinArray):
+        amounts = amounts.total()
+    else:
+        amounts = _toColumn('amounts', amounts)
+        if (amounts < 0).any():
+            raise WizCoinException('amounts must be positive ints, not negative')
+    if isinstance(inventory, WizCoinArray):
+        if len(inventory) != len(amounts):
+            raise WizCoinException('need one inventory per amount, or a single WizCoin inventory')
+        haveGalleons, haveSickles, haveKnuts = inventory._galleons, inventory._sickles, inventory._knuts
+    else:
+        haveGalleons, haveSickles, haveKnuts = inventory.galleons, inventory.sickles, inventory.knuts
+
+    # The same largest-coin-first rule as wizcoin.makeChange(), for all amounts at once:
+    galleons = np.minimum(haveGalleons, amounts // KNUTS_PER_GALLEON)
+    remaining = amounts - galleons * KNUTS_PER_GALLEON
+    sickles = np.minimum(haveSickles, remaining // KNUTS_PER_SICKLE)
+    knuts = remaining - sickles * KNUTS_PER_SICKLE
+    feasible = knuts <= haveKnuts
+    return (WizCoinArray._fromTrusted(np.where(feasible, galleons, 0),
+                                      np.where(feasible, sickles, 0),
+                                      np.where(feasible, knuts, 0)), feasible)
@@ -0,0 +1,149 @@
+#! /usr/bin/python3
+'''Benchmarks for the wizcoin module.
+
+Run with:  python wizcoinbenchmark.py [NUMBER_OF_PURSES]'''
+
+import bisect
+import operator
+import random
+import sys
+import threading
+import time
+import timeit
+import tracemalloc
+
+import wizcoin
+import wizcoinconcurrent
+
+class DictWizCoin(wizcoin.WizCoin):
+    '''A WizCoin subclass without __slots__, so every object gets a
+    __dict__ the way WizCoin objects used to.'''
+    pass
+
+class HelperWizCoin(wizcoin.WizCoin):
+    '''A WizCoin subclass that sends every comparison through
+    comparisonOperatorHelper(), the way WizCoin used to.'''
+    __slots__ = ()
+    def __eq__(self, other):
+        return self.comparisonOperatorHelper(operator.eq, other)
+    def __ne__(self, other):
+        return self.comparisonOperatorHelper(operator.ne, other)
+    def __lt__(self, other):
+        return self.comparisonOperatorHelper(operator.lt, other)
+    def __le__(self, other):
+        return self.comparisonOperatorHelper(operator.le, other)
+    def __gt__(self, other):
+        return self.comparisonOperatorHelper(operator.gt, other)
+    def __ge__(self, other):
+        return self.comparisonOperatorHelper(operator.ge, other)
+
+def bytesPerObject(factory, count=100_000):
+    '''Returns the average number of bytes allocated per object made by factory().'''
+    tracemalloc.start()
+    objects = [factory(i) for i in range(count)]
+    size, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # The list holding the objects is allocated too, so don't count it:
+    return (size - objects.__sizeof__()) / count
+
+def opsPerSecond(statement, setup='pass', number=200_000, namespace=None):
+    '''Returns how many times per second statement can run.'''
+    seconds = min(timeit.repeat(statement, setup, number=number, repeat=3, globals=namespace))
+    return number / seconds
+
+def benchSlots():
+    '''Compares slotted WizCoin objects and the trusted constructor
+    against WizCoin objects that carry a __dict__.'''
+    print('Per-object memory:')
+    dictBytes = bytesPerObject(lambda i: DictWizCoin(i, 1, 1))
+    slotBytes = bytesPerObject(lambda i: wizcoin.WizCoin(i, 1, 1))
+    print(f'  with __dict__: {dictBytes:8.1f} bytes')
+    print(f'  __slots__:     {slotBytes:8.1f} bytes')
+
+    namespace = {'WizCoin': wizcoin.WizCoin, 'DictWizCoin': DictWizCoin,
+                 'a': wizcoin.WizCoin(2, 5, 99), 'b': wizcoin.WizCoin(1, 1, 1)}
+    print('Operations per second:')
+    for label, statement in (('DictWizCoin(2, 5, 99)', 'DictWizCoin(2, 5, 99)'),
+                             ('WizCoin(2, 5, 99)', 'WizCoin(2, 5, 99)'),
+                             ('WizCoin._fromTrusted(2, 5, 99)', 'WizCoin._fromTrusted(2, 5, 99)'),
+                             ('a + b', 'a + b'),
+                             ('a * 3', 'a * 3')):
+        print(f'  {label:32} {opsPerSecond(statement, namespace=namespace):12,.0f}')
+
+def benchParsing():
+    '''Compares fromRepr(), fromString() and parseMany() against eval(repr(purse)).'''
+    amounts = [wizcoin.WizCoin(g, s, k) for g in range(5) for s in range(0, 17, 4) for k in range(0, 29, 7)]
+    reprs = [repr(purse) for purse in amounts] * 20
+    strs = [str(purse) for purse in amounts] * 20
+    namespace = {'WizCoin': wizcoin.WizCoin, 'wizcoin': wizcoin, 'reprs': reprs, 'strs': strs}
+    print(f'Parsing ({len(reprs):,} strings, {len(amounts)} distinct amounts), strings per second:')
+    for label, statement in (('eval(repr)', '[eval(text) for text in reprs]'),
+                             ('WizCoin.fromRepr()', '[WizCoin.fromRepr(text) for text in reprs]'),
+                             ('WizCoin.fromString()', '[WizCoin.fromString(text) for text in strs]'),
+                             ('wizcoin.parseMany()', 'wizcoin.parseMany(reprs)')):
+        rate = opsPerSecond(statement, number=20, namespace=namespace) * len(reprs)
+        print(f'  {label:32} {rate:12,.0f}')
+
+def secondsFor(func, *args):
+    '''Returns how many seconds func(*args) took to run once.'''
+    startTime = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - startTime
+
+def benchComparisons(count):
+    '''Times sort(), min()/max() and bisect over count purses, comparing
+    the fast comparison dispatch against comparisonOperatorHelper().'''
+    rng = random.Random(42)
+    triples = [(rng.randrange(100), rng.randrange(17), rng.randrange(29)) for i in range(count)]
+    print(f'Comparisons over {count:,} purses, seconds:')
+    print(f'  {"":32} {"helper":>10} {"dispatch":>10}')
+    results = {}
+    for cls in (HelperWizCoin, wizcoin.WizCoin):
+        purses = [cls(*triple) for triple in triples]
+        ordered = sorted(purses)
+        probes = purses[:10_000]
+        results[cls] = (
+            ('sorted(purses)', secondsFor(sorted, purses)),
+            ('sorted(purses, key=totalKey)', secondsFor(lambda: sorted(purses, key=wizcoin.totalKey))),
+            ('min(purses), max(purses)', secondsFor(lambda: (min(purses), max(purses)))),
+            ('bisect_left() x 10,000', secondsFor(lambda: [bisect.bisect_left(ordered, p) for p in probes])),
+            ('purse == int x 10,000', secondsFor(lambda: [p == 1000 for p in probes])),
+            ('purse < (g, s, k) x 10,000', secondsFor(lambda: [p < (1, 2, 3) for p in probes])),
+        )
+    for (label, helperSeconds), (label, dispatchSeconds) in zip(results[HelperWizCoin], results[wizcoin.WizCoin]):
+        print(f'  {label:32} {helperSeconds:10.4f} {dispatchSeconds:10.4f}')
+
+def benchConcurrency(maxThreads=8, addsPerThread=100_000):
+    '''Measures total adds per second from 1 to maxThreads threads, for the
+    striped ConcurrentWizCoin and a WizCoin behind a single lock.'''
+    print(f'Concurrent adds per second ({addsPerThread:,} adds per thread):')
+    print(f'  {"threads":>7} {"one lock":>14} {"striped":>14}')
+    coin = wizcoin.WizCoin(0, 1, 1)
+    for numThreads in range(1, maxThreads + 1):
+        rates = []
+        for cls in (wizcoinconcurrent.LockedWizCoin, wizcoinconcurrent.ConcurrentWizCoin):
+            accumulator = cls()
+            def work():
+                add = accumulator.add
+                for i in range(addsPerThread):
+                    add(coin)
+            threads = [threading.Thread(target=work) for i in range(numThreads)]
+            startTime = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            seconds = time.perf_counter() - startTime
+            assert accumulator.value() == coin * (numThreads * addsPerThread), 'lost coins'
+            rates.append(numThreads * addsPerThread / seconds)
+        print(f'  {numThreads:7} {rates[0]:14,.0f} {rates[1]:14,.0f}')
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10 ** 6
+    benchSlots()
+    benchParsing()
+    benchComparisons(count)
+    benchConcurrency()
+
+if __name__ == '__main__':
+    main()
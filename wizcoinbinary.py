@@ -0,0 +1,214 @@
+#! /usr/bin/python3
+'''A compact binary file format for sequences of WizCoin amounts.
+
+A file starts with a 24-byte header:
+
+    magic      4 bytes  b'WZCN'
+    version    1 byte   1
+    encoding   1 byte   FIXED (0) or VARINT (1)
+    reserved   2 bytes  0
+    count      8 bytes  number of records
+    indexStart 8 bytes  offset of the varint index, 0 for FIXED files
+
+followed by one record per purse. FIXED records are three little-endian
+unsigned 64-bit ints (galleons, sickles, knuts), so record i is found by
+arithmetic. VARINT records are three LEB128 varints, which makes small
+amounts take as little as 3 bytes. After the VARINT records comes an
+index with the offset of every INDEX_STRIDE-th record, so reading record
+i only decodes at most INDEX_STRIDE - 1 records before it.
+
+load() memory-maps a file and loads() wraps any bytes-like object. Both
+return a WizCoinFile that decodes records only as they are asked for.'''
+
+import collections.abc
+import io
+import mmap
+import os
+import struct
+
+import wizcoin
+
+MAGIC = b'WZCN'
+VERSION = 1
+FIXED, VARINT = 0, 1
+INDEX_STRIDE = 1024
+
+_HEADER = struct.Struct('<4sBBHQQ')
+_FIXED_RECORD = struct.Struct('<QQQ')
+_INDEX_ENTRY = struct.Struct('<Q')
+
+def _encodeVarint(value, out):
+    '''Appends value to the bytearray out as an LEB128 varint.'''
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _decodeVarint(view, offset):
+    '''Returns (value, nextOffset) for the varint at offset in view.'''
+    value = shift = 0
+    while True:
+        byte = view[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+def dump(purses, file, encoding=FIXED):
+    '''Writes an iterable of WizCoin objects to file, which is a path or a
+    seekable binary file object. Returns the number of purses written.'''
+    if isinstance(file, (str, bytes)) or hasattr(file, '__fspath__'):
+        with open(file, 'wb') as binaryFile:
+            return dump(purses, binaryFile, encoding)
+    if encoding not in (FIXED, VARINT):
+        raise wizcoin.WizCoinException('unknown encoding: ' + repr(encoding))
+
+    headerStart = file.tell()
+    file.write(bytes(_HEADER.size)) # Filled in once the count is known.
+    count = 0
+    offset = _HEADER.size
+    indexOffsets = []
+    buffer = bytearray()
+    for purse in purses:
+        if encoding == FIXED:
+            try:
+                buffer += _FIXED_RECORD.pack(purse.galleons, purse.sickles, purse.knuts)
+            except struct.error:
+                raise wizcoin.WizCoinException(f'{purse!r} has more than {2 ** 64 - 1} of a coin, '
+                                               'which only the VARINT encoding can store') from None
+        else:
+            if count % INDEX_STRIDE == 0:
+                indexOffsets.append(offset + len(buffer))
+            _encodeVarint(purse.galleons, buffer)
+            _encodeVarint(purse.sickles, buffer)
+            _encodeVarint(purse.knuts, buffer)
+        count += 1
+        if len(buffer) >= 1 << 16:
+            file.write(buffer)
+            offset += len(buffer)
+            buffer.clear()
+    file.write(buffer)
+    offset += len(buffer)
+
+    indexStart = 0
+    if encoding == VARINT:
+        indexStart = offset
+        file.write(b''.join(_INDEX_ENTRY.pack(indexOffset) for indexOffset in indexOffsets))
+    endPosition = file.tell()
+    file.seek(headerStart)
+    file.write(_HEADER.pack(MAGIC, VERSION, encoding, 0, count, indexStart))
+    file.seek(endPosition)
+    return count
+
+def dumps(purses, encoding=FIXED):
+    '''Returns the bytes of an iterable of WizCoin objects in this format.'''
+    binaryFile = io.BytesIO()
+    dump(purses, binaryFile, encoding)
+    return binaryFile.getvalue()
+
+def load(path):
+    '''Memory-maps the file at path and returns a WizCoinFile for it.
+    Nothing is decoded until records are asked for.'''
+    with open(path, 'rb') as binaryFile:
+        if os.fstat(binaryFile.fileno()).st_size < _HEADER.size: # mmap can't map an empty file.
+            raise wizcoin.WizCoinException('not a WizCoin binary file: too short')
+        mapped = mmap.mmap(binaryFile.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        return WizCoinFile(mapped, mapped)
+    except wizcoin.WizCoinException:
+        mapped.close()
+        raise
+
+def loads(data):
+    '''Returns a WizCoinFile that reads records straight out of data, which
+    is any bytes-like object, without copying it.'''
+    return WizCoinFile(data)
+
+class WizCoinFile(collections.abc.Sequence):
+    '''A read-only sequence of the WizCoin records in a buffer. Each
+    record is decoded when it is indexed or iterated over.'''
+
+    def __init__(self, data, mapped=None):
+        self._view = memoryview(data).cast('B')
+        self._mmap = mapped # Closed by close(), if this object owns an mmap.
+        try:
+            self.encoding, self._count, self._indexStart = self._readHeader()
+        except wizcoin.WizCoinException:
+            self._view.release() # So the caller can close the buffer.
+            raise
+
+    def _readHeader(self):
+        '''Returns (encoding, count, indexStart) from the header, checking
+        that the buffer is long enough for the records it describes.'''
+        if len(self._view) < _HEADER.size:
+            raise wizcoin.WizCoinException('not a WizCoin binary file: too short')
+        magic, version, encoding, reserved, count, indexStart = _HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC:
+            raise wizcoin.WizCoinException('not a WizCoin binary file: bad magic ' + repr(magic))
+        if version != VERSION or encoding not in (FIXED, VARINT):
+            raise wizcoin.WizCoinException(f'unsupported WizCoin binary file: version {version}, encoding {encoding}')
+        if encoding == FIXED:
+            end = _HEADER.size + count * _FIXED_RECORD.size
+        else:
+            end = indexStart + -(-count // INDEX_STRIDE) * _INDEX_ENTRY.size
+            if count and indexStart < _HEADER.size + 3 * count:
+                raise wizcoin.WizCoinException(f'corrupt WizCoin binary file: index starts at {indexStart}')
+        if len(self._view) < end:
+            raise wizcoin.WizCoinException(f'truncated WizCoin binary file: {count} records need '
+                                           f'{end} bytes, but there are {len(self._view)}')
+        return encoding, count, indexStart
+
+    def close(self):
+        '''Releases the buffer, and closes the memory map if load() made one.'''
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('WizCoinFile index out of range')
+        if self.encoding == FIXED:
+            return wizcoin.WizCoin._fromTrusted(*_FIXED_RECORD.unpack_from(self._view, _HEADER.size + index * _FIXED_RECORD.size))
+
+        # Jump to the nearest indexed record, then decode forward to index:
+        blockNumber, skip = divmod(index, INDEX_STRIDE)
+        offset, = _INDEX_ENTRY.unpack_from(self._view, self._indexStart + blockNumber * _INDEX_ENTRY.size)
+        view = self._view
+        for i in range(skip * 3):
+            offset = _decodeVarint(view, offset)[1]
+        galleons, offset = _decodeVarint(view, offset)
+        sickles, offset = _decodeVarint(view, offset)
+        knuts, offset = _decodeVarint(view, offset)
+        return wizcoin.WizCoin._fromTrusted(galleons, sickles, knuts)
+
+    def __iter__(self):
+        '''Decodes the records one at a time from start to end.'''
+        view, fromTrusted = self._view, wizcoin.WizCoin._fromTrusted
+        if self.encoding == FIXED:
+            # unpack_from() doesn't hold on to a slice of the view between
+            # records, so close() still works after a partial iteration:
+            unpackFrom, size = _FIXED_RECORD.unpack_from, _FIXED_RECORD.size
+            for offset in range(_HEADER.size, _HEADER.size + self._count * size, size):
+                yield fromTrusted(*unpackFrom(view, offset))
+            return
+        offset = _HEADER.size
+        for i in range(self._count):
+            galleons, offset = _decodeVarint(view, offset)
+            sickles, offset = _decodeVarint(view, offset)
+            knuts, offset = _decodeVarint(view, offset)
+            yield fromTrusted(galleons, sickles, knuts)
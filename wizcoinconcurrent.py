@@ -0,0 +1,93 @@
+#! /usr/bin/python3
+'''A WizCoin accumulator that many threads can add to at once.
+
+WizCoin.__iadd__() does three separate read-modify-writes, so two threads
+adding to the same purse can interleave and lose coins. Putting one lock
+around the purse fixes that, but then every thread waits on that lock.
+
+ConcurrentWizCoin instead gives each thread its own partial sum (a
+"stripe"). A thread only ever writes to its own stripe, and it replaces
+the stripe's (galleons, sickles, knuts) tuple in a single assignment, so
+adding needs no lock at all. Reading the value adds up every stripe.'''
+
+import threading
+
+from wizcoin import WizCoin, WizCoinException
+
+class _Stripe:
+    '''One thread's partial sum, as a (galleons, sickles, knuts) tuple.'''
+    __slots__ = ('partial',)
+
+    def __init__(self):
+        self.partial = (0, 0, 0)
+
+class ConcurrentWizCoin:
+    def __init__(self, galleons=0, sickles=0, knuts=0):
+        """Create a new ConcurrentWizCoin that starts out holding galleons,
+        sickles and knuts."""
+        self._start = WizCoin(galleons, sickles, knuts) # Checks the coin counts.
+        self._stripes = []
+        self._stripesLock = threading.Lock() # Only used when a thread adds its first stripe.
+        self._local = threading.local()
+
+    def _getStripe(self):
+        """Returns the calling thread's stripe, creating it on first use."""
+        try:
+            return self._local.stripe
+        except AttributeError:
+            stripe = self._local.stripe = _Stripe()
+            with self._stripesLock:
+                # Copy-on-write, so readers can loop over _stripes without the lock:
+                self._stripes = self._stripes + [stripe]
+            return stripe
+
+    def add(self, purse):
+        """Adds the coins in the WizCoin purse to this accumulator."""
+        if not isinstance(purse, WizCoin):
+            raise WizCoinException('can only add WizCoin objects, not ' + purse.__class__.__qualname__)
+        stripe = self._getStripe()
+        galleons, sickles, knuts = stripe.partial
+        # Only this thread writes to its stripe, and readers see either the
+        # old tuple or the new one, never a mix of the two:
+        stripe.partial = (galleons + purse._galleons, sickles + purse._sickles, knuts + purse._knuts)
+
+    def __iadd__(self, other):
+        """Adds the coins in another WizCoin object to this accumulator."""
+        if not isinstance(other, WizCoin):
+            return NotImplemented
+        self.add(other)
+        return self # In-place dunder methods almost always return self.
+
+    def value(self):
+        """Returns a new WizCoin holding all the coins added so far. Each
+        thread's additions are either all counted or not counted yet."""
+        galleons, sickles, knuts = self._start.galleons, self._start.sickles, self._start.knuts
+        for stripe in self._stripes:
+            g, s, k = stripe.partial
+            galleons += g
+            sickles += s
+            knuts += k
+        return WizCoin._fromTrusted(galleons, sickles, knuts)
+
+    def total(self):
+        """The value (in knuts) of all the coins added so far."""
+        return self.value().total()
+
+    def __repr__(self):
+        value = self.value()
+        return f'{self.__class__.__qualname__}({value.galleons}, {value.sickles}, {value.knuts})'
+
+class LockedWizCoin:
+    '''The simple alternative to ConcurrentWizCoin: one WizCoin behind one
+    lock. wizcoinbenchmark.py compares the two.'''
+    def __init__(self, galleons=0, sickles=0, knuts=0):
+        self._purse = WizCoin(galleons, sickles, knuts)
+        self._lock = threading.Lock()
+
+    def add(self, purse):
+        with self._lock:
+            self._purse += purse
+
+    def value(self):
+        with self._lock:
+            return WizCoin._fromTrusted(self._purse.galleons, self._purse.sickles, self._purse.knuts)
@@ -0,0 +1,144 @@
+#! /usr/bin/python3
+'''Adds up huge ledger files of WizCoin amounts with constant memory.
+
+Each row of a ledger is one amount, either as CSV ("2,5,99") or as a
+JSON Lines record ("[2, 5, 99]" or '{"galleons": 2, "sickles": 5,
+"knuts": 99}'). The rows are read in chunks and added into a single
+running WizCoin, so the file is never held in memory. In parallel mode
+the file is split into byte ranges that a process pool adds up
+separately, and the partial purses are merged at the end. A CSV file may
+start with a header row; any other row that isn't an amount raises
+WizCoinException.
+
+Usage: python wizcoinledger.py [--processes N] LEDGER_FILE'''
+
+import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
+import os
+import time
+
+import wizcoin
+
+CHUNK_ROWS = 64 * 1024 # How many rows to add up between updates of the running purse.
+
+class LedgerTotal(collections.namedtuple('LedgerTotal', 'purse rows seconds')):
+    '''The result of adding up a ledger. purse is normalized, see WizCoin.normalized().'''
+    __slots__ = ()
+
+    @property
+    def rowsPerSecond(self):
+        '''Returns how many rows per second were added up.'''
+        return self.rows / self.seconds if self.seconds else 0.0
+
+def _parseCsvRow(line):
+    '''Returns the (galleons, sickles, knuts) of a "g,s,k" CSV line.'''
+    galleons, sickles, knuts = line.split(b',')
+    return int(galleons), int(sickles), int(knuts)
+
+def _parseJsonRow(line):
+    '''Returns the (galleons, sickles, knuts) of a JSON Lines record.'''
+    record = json.loads(line)
+    if isinstance(record, dict):
+        return record['galleons'], record['sickles'], record['knuts']
+    galleons, sickles, knuts = record
+    return galleons, sickles, knuts
+
+def _getRowParser(path):
+    '''Picks the row parser for path from its file extension.'''
+    if os.path.splitext(path)[1].lower() in ('.jsonl', '.json', '.ndjson'):
+        return _parseJsonRow
+    return _parseCsvRow
+
+def _iterRangeLines(ledgerFile, start, end):
+    '''Yields the lines of ledgerFile that begin at a byte offset in
+    start <= offset < end. A line that straddles start belongs to the
+    previous range, so it is skipped.'''
+    if start > 0:
+        # Back up one byte so that a line beginning exactly at start isn't skipped:
+        ledgerFile.seek(start - 1)
+        position = start - 1 + len(ledgerFile.readline())
+    else:
+        ledgerFile.seek(0)
+        position = 0
+    while position < end:
+        line = ledgerFile.readline()
+        if not line:
+            break
+        position += len(line)
+        yield line
+
+def _reduceRange(path, start, end, chunkRows=CHUNK_ROWS):
+    '''Adds up the rows of path that begin in the byte range start..end.
+    Returns a (galleons, sickles, knuts, rows) tuple.'''
+    parseRow = _getRowParser(path)
+    purse = wizcoin.WizCoin(0, 0, 0) # The running total, updated in place.
+    rows = 0
+    with open(path, 'rb') as ledgerFile:
+        lines = _iterRangeLines(ledgerFile, start, end)
+        if start == 0 and parseRow is _parseCsvRow:
+            # Only the first line of a CSV file can be a header row:
+            firstLine = next(lines, b'')
+            if not firstLine.lstrip(b'\xef\xbb\xbf').strip()[:1].isalpha(): # Allow a UTF-8 byte order mark.
+                lines = itertools.chain([firstLine], lines)
+        while True:
+            chunk = list(itertools.islice(lines, chunkRows))
+            if not chunk:
+                break
+            galleons = sickles = knuts = 0
+            for line in chunk:
+                line = line.strip()
+                if not line:
+                    continue # Skip blank lines.
+                try:
+                    g, s, k = parseRow(line)
+                except (ValueError, KeyError, TypeError) as exc:
+                    raise wizcoin.WizCoinException(f'bad ledger row {line!r}: {exc}') from None
+                if not (type(g) is type(s) is type(k) is int) or g < 0 or s < 0 or k < 0:
+                    raise wizcoin.WizCoinException(f'bad ledger row {line!r}: coin counts must be positive ints')
+                galleons += g
+                sickles += s
+                knuts += k
+                rows += 1
+            purse += wizcoin.WizCoin._fromTrusted(galleons, sickles, knuts)
+    return purse.galleons, purse.sickles, purse.knuts, rows
+
+def reduceFile(path, processes=1, chunkRows=CHUNK_ROWS):
+    '''Adds up every row of the ledger file at path and returns a
+    LedgerTotal. With processes > 1 the file is split into byte ranges
+    that are added up in a process pool.'''
+    startTime = time.perf_counter()
+    fileSize = os.path.getsize(path)
+    if processes <= 1:
+        partials = [_reduceRange(path, 0, fileSize, chunkRows)]
+    else:
+        # Use a few ranges per process so one slow range doesn't hold up the rest:
+        numRanges = processes * 4
+        bounds = [fileSize * i // numRanges for i in range(numRanges + 1)]
+        with concurrent.futures.ProcessPoolExecutor(processes) as pool:
+            partials = list(pool.map(_reduceRange, itertools.repeat(path), bounds[:-1], bounds[1:],
+                                     itertools.repeat(chunkRows)))
+
+    purse = wizcoin.WizCoin(0, 0, 0)
+    rows = 0
+    for galleons, sickles, knuts, partialRows in partials:
+        purse += wizcoin.WizCoin._fromTrusted(galleons, sickles, knuts)
+        rows += partialRows
+    return LedgerTotal(purse.normalized(), rows, time.perf_counter() - startTime)
+
+def main():
+    parser = argparse.ArgumentParser(description='Add up a ledger of WizCoin amounts.')
+    parser.add_argument('ledger', help='a CSV or JSON Lines file of galleons,sickles,knuts rows')
+    parser.add_argument('--processes', type=int, default=1, help='number of worker processes')
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS, help='rows to read per chunk')
+    args = parser.parse_args()
+
+    result = reduceFile(args.ledger, args.processes, args.chunk_rows)
+    print(f'Total:  {result.purse} ({result.purse.total()} knuts)')
+    print(f'Rows:   {result.rows:,}')
+    print(f'Speed:  {result.rowsPerSecond:,.0f} rows/sec ({result.seconds:.2f} seconds)')
+
+if __name__ == '__main__':
+    main()